@@ -1,23 +1,28 @@
 import numpy as np
 import time
 import random
+import threading
 from typing import Optional
-from typing import Tuple
+from typing import Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
 
 
-from scipy.signal.sigtools import _convolve2d
+from agents.common import PlayerAction, BoardPiece, SavedState, PLAYER1, PLAYER2, NO_PLAYER, CONNECT_N, BOARD_COLS
+from agents.common import  apply_player_action, connected_four, legal_actions, moved_cell, BoardState, Bitboard
+from agents.windows import connected_n
+from agents.endgame import EndgameSolver
+from agents.agent_MCTS.rollout import rollout, batch_rollouts, rollout_nogil, score_winners
+from agents.jit import JIT_ENABLED
+from agents.agent_MCTS.pool import NodePool, PoolState, grow_pool
+from agents.agent_MCTS.budget import SearchBudget, as_budget
+from agents.agent_MCTS.solver import WIN, DRAW, SOLVED_RANK, backup_proof
+from agents.agent_MCTS.policy import SelectionPolicy, UCB1, CELL_PRIORS, get_policy
+from agents.metrics import SearchStats, MetricsHook, report
 
-from agents.common import PlayerAction, BoardPiece, SavedState, PLAYER1, PLAYER2, NO_PLAYER, CONNECT_N
-from agents.common import  apply_player_action, connected_four
 
-col_kernel = np.ones((CONNECT_N, 1), dtype=BoardPiece)
-row_kernel = np.ones((1, CONNECT_N), dtype=BoardPiece)
-dia_l_kernel = np.diag(np.ones(CONNECT_N, dtype=BoardPiece))
-dia_r_kernel = np.array(np.diag(np.ones(CONNECT_N, dtype=BoardPiece))[::-1, :])
 
 
-
-def get_player_actions(board: np.ndarray, player: BoardPiece, _last_action: Optional[PlayerAction] = None) -> list: #could move this to common
+def get_player_actions(board: Union[np.ndarray, Bitboard], player: BoardPiece, _last_action: Optional[PlayerAction] = None) -> list: #could move this to common
 
     '''
     Returns an array with the possible columns that a player could place a piece in.
@@ -26,18 +31,16 @@ def get_player_actions(board: np.ndarray, player: BoardPiece, _last_action: Opti
     a terminal state has been reached.
     '''
 
+    if isinstance(board, Bitboard):
+        if _last_action is not None and board.is_win(player):
+            return [] #if game is won
+        return board.legal_actions()
+
     if _last_action != None:
         if connected_four(board, player, _last_action):
             return [] #if game is won
 
-    if np.count_nonzero(board) == board.shape[0] * board.shape[1]:
-        return [] #if game is draw
-
-    player_actions = []
-    for col in range(board.shape[1]):
-        if np.count_nonzero(board[:,col]) < board.shape[0]:
-            player_actions.append(col)
-    return player_actions #if still possible actions
+    return legal_actions(board) #empty if game is draw
 
 def check_result(
         board: np.ndarray, player: BoardPiece,  _last_action: Optional[PlayerAction] = None) -> bool:
@@ -45,34 +48,15 @@ def check_result(
     ''' check if the board is a "terminal" board: a win or a draw
     and assigns a value to each option that can be used by an evaluation function'''
 
-    board1 = board.copy()
-    board2 = board.copy()
-
     MinPiece = 3 - player
 
     MaxPiece = player
 
-    board1[board1 == MinPiece] = NO_PLAYER
-    board1[board1 == MaxPiece] = BoardPiece(1)
-
-    for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
-        result = _convolve2d(board1, kernel, 1, 0, 0, BoardPiece(0))
-        if np.any(result == CONNECT_N):
-            # print(time)
-            # print(MaxPiece)
-            # print("won")
-            return 1 #self wins
+    if connected_n(board, MaxPiece):
+        return 1 #self wins
 
-    board2[board2 == MaxPiece] = NO_PLAYER
-    board2[board2 == MinPiece] = BoardPiece(1)
-
-    for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
-        result = _convolve2d(board2, kernel, 1, 0, 0, BoardPiece(0))
-        if np.any(result == CONNECT_N):
-            # print(time)
-            # print(MinPiece)
-            # print("lost")
-            return -0.1 #opponent wins
+    if connected_n(board, MinPiece):
+        return -0.1 #opponent wins
 
     if np.count_nonzero(board) == board.shape[0] * board.shape[1]:
         # print(board)
@@ -82,141 +66,478 @@ def check_result(
     return False
 
 
+_UCB1 = UCB1() #default policy of Node.selection
+
+
 class Node:
     '''
     generates one node in the game tree and if applicable has access to info about parent and child nodes
-    board: the state of the board at the current node
+    board: the state of the board at the current node, only used to find the unexplored actions (it is not stored,
+    the search walks one mutable board instead)
     parent: one node up in the game tree from the current node
     action: the action that led from the parent node to the current node
     wins: the number of wins that followed visiting this node
     visits: the number of times this node was visited
+    squares: the sum of the squared results, for the variance used by UCB1-Tuned
+    prior: prior weight of the action (see move_priors), used by PUCT
+    proven: WIN, DRAW or LOSS for the player of the node once the result is known (see solver.py), else None
     '''
 
-    def __init__(self, player: BoardPiece=None, action: Optional[PlayerAction]=None, parent=None, board: np.ndarray=None):
-        self.board = board.copy()
+    def __init__(self, player: BoardPiece=None, action: Optional[PlayerAction]=None, parent=None, board: Union[np.ndarray, Bitboard]=None,
+                 prior: float = 1.0):
         self.parent = parent
         self.action = action
         self.childNodes = []
         self.wins = 0
         self.visits = 0
+        self.squares = 0
+        self.prior = prior
+        self.proven = None
         self.player = player
-        self.action_notExp = get_player_actions(self.board, self.player, self.action)
+        self.action_notExp = get_player_actions(board, self.player, self.action)
 
-    def selection(self):
+    def selection(self, policy: Optional[SelectionPolicy] = None):
         '''
         Selection step of MCTS:
         Traverses current tree from root node and selects the node with the highest estimated value.
-        :return: a new node (class), which is the best out of the available children
+        :param policy: scores the children, UCB1 (as below) if None
+        :return: a new node (class), which is the best out of the available children (proven children are skipped)
         '''
 
-        ucb = lambda child: child.wins / child.visits + np.sqrt(np.log(self.visits) / child.visits)
-        return sorted(self.childNodes, key=ucb)[-1]  # child with largest UCB value
+        if policy is None:
+            policy = _UCB1
+        children = [child for child in self.childNodes if child.proven is None] or self.childNodes
+        index = policy.select(np.array([child.wins for child in children], dtype=np.float64),
+                              np.array([child.visits for child in children], dtype=np.float64),
+                              np.array([child.squares for child in children], dtype=np.float64),
+                              np.array([child.prior for child in children], dtype=np.float64),
+                              self.visits)
+        return children[index]
+
+        # ucb = lambda child: child.wins / child.visits + np.sqrt(np.log(self.visits) / child.visits)
+        # return sorted(self.childNodes, key=ucb)[-1]  # child with largest UCB value
 
-    def expansion(self, action: np.int8):
+    def expansion(self, action: np.int8, state: Union[Bitboard, BoardState]):
         '''
         Expansion step of MCTS:
         Once a node has been selected it finds the leaf node and adds a further child node unless it is a terminal node.
         :param action: action to be applied to board
-        :param board: current palying board
+        :param state: current playing board at this node, the action is applied to it in place
         :return: a new child node
         '''
 
         # return child when action is taken
         # remove action from current node
 
-        board = apply_player_action(self.board.copy(), action, 3- self.player)
-        child = Node(action=action, player=3-self.player, parent=self, board=board)
+        state.apply(action, 3 - self.player)
+        child = Node(action=action, player=3-self.player, parent=self, board=state if isinstance(state, Bitboard) else state.board,
+                     prior=CELL_PRIORS[state.heights[action] - 1, action])
         self.action_notExp.remove(action)
         self.childNodes.append(child)
         return child
 
-    def update(self, result:float):
+    def update(self, result:float, visits: int = 1, squares: Optional[float] = None):
 
         """
         updates the number of state visits and wins that are associated to choosing this state
         :param self: class of current node
-        :param result: 1 if win, -0.5 if draw, 0 if lost
-        :return: updates elements wins and visits in class, visits consitently increase by 1
+        :param result: 1 if win, -0.5 if draw, 0 if lost (summed over all simulations)
+        :param visits: number of simulations the result stems from
+        :param squares: sum of the squared results of the simulations, result**2 if None (one simulation)
+        :return: updates elements wins and visits in class, visits consitently increase by 1 per simulation
         """
 
         self.wins += result
-        self.visits += 1
+        self.visits += visits
+        self.squares += result * result if squares is None else squares
 
 
-# main function for the Monte Carlo Tree Search
-def monte_carlo_tree_search(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState], timeout: np.int8 =10
-) -> Tuple[PlayerAction, Optional[SavedState]]:
+def tree_shape(root: Node) -> Tuple[int, int]:
+    '''returns the number of nodes of the tree below `root` and the number of moves to its deepest node'''
+    size, depth = 0, -1
+    level = [root]
+    while level:
+        size += len(level)
+        depth += 1
+        level = [child for node in level for child in node.childNodes]
+    return size, depth
 
-    '''
-    4 step tree search algorithm:
-     1. Selection
-     2. Expansion
-     3. Simulation
-     4. Bakpropagation
 
-    :param board:
-    :param player:
-    :param saved_state:
-    :param timeout:
-    :return:
+class MCTSState(SavedState):
+    '''
+    state of the MCTS agent kept between its moves, so that the search tree is reused
+    root: node of the position after the agent's last move, holding the statistics of all earlier simulations
+    board: the playing board after the agent's last move
+    pool: (workers, process pool) of root_parallel_search, kept between moves so that starting the processes
+    does not count against the time of a move (see executor)
     '''
 
-    MinPiece = 3 - player
-    MaxPiece = player
-
-    root= Node(board=board, player=MinPiece)
-
-    #check immediate win
+    def __init__(self, root: Node, board: np.ndarray, pool: Optional[Tuple[int, ProcessPoolExecutor]] = None):
+        self.root = root
+        self.board = board
+        self.pool = pool
+
+    def executor(self, workers: int) -> ProcessPoolExecutor:
+        '''returns the process pool with `workers` processes, started at the first call'''
+        if self.pool is None or self.pool[0] != workers:
+            self.close()
+            self.pool = (workers, ProcessPoolExecutor(max_workers=workers))
+        return self.pool[1]
+
+    def close(self):
+        '''shuts the process pool down'''
+        if self.pool is not None:
+            self.pool[1].shutdown()
+            self.pool = None
+
+    def advance(self, board: np.ndarray) -> Optional[Node]:
+        '''
+        finds the node of `board` below the saved root, i.e. after the opponent's reply to the agent's last move
+        :return: the node (detached from its parent) or None if the board does not follow from the saved one
+        '''
+        cell = moved_cell(self.board, board)
+        if cell is None:
+            return None
+        action = cell[1]
+        for child in self.root.childNodes:
+            if child.action == action:
+                child.parent = None #the rest of the old tree can be freed
+                return child
+        return None
+
+
+def grow_tree(root: Node, state: Bitboard, MaxPiece: BoardPiece, timeout: Union[float, SearchBudget], rollouts: int = 1,
+              rng: Optional[np.random.Generator] = None, policy: Optional[SelectionPolicy] = None) -> Node:
+    '''
+    runs MCTS iterations (selection, expansion, simulation, backpropagation) on the tree below `root`
+    until `timeout` seconds have passed, or until a SearchBudget is used up
+    :param state: the board at the root, walked by every iteration and restored afterwards
+    :param MaxPiece: the player the results are counted for
+    :param policy: selection policy, UCB1 if None
+    :return: the root
+    '''
 
-    for action in root.action_notExp:
-        state = board.copy()
-        apply_player_action(state, action, MaxPiece)
-        if connected_four(state, MaxPiece, action) == True:
-            return action,  saved_state
+    if rng is None and rollouts > 1:
+        rng = np.random.default_rng()
 
-    start = time.clock()
-    while True:
+    budget = as_budget(timeout)
+    added = 0 #nodes added to the tree
+    while root.proven is None: #stop when the result of the root is known
 
         node = root
-        state = board.copy()
+        path = [] #actions applied to state in this iteration, undone at the end
 
         # selection
         # keep going down the tree based on best UCT values until terminal (no more children) or unexpanded node (no more moves to expand)
         while node.action_notExp == [] and node.childNodes != []:
-            node = node.selection()
-            apply_player_action(state, node.action, MaxPiece)
+            node = node.selection(policy)
+            state.apply(node.action, node.player)
+            path.append(node.action)
 
 
         # expansion
         if node.action_notExp != []:
             action = random.choice(node.action_notExp)
-            node = node.expansion(action)
+            node = node.expansion(action, state)
+            path.append(action)
+            added += 1
 
         # simulation
-        state = node.board.copy()
+        terminal = node.action is not None and state.is_win(node.player)
+        if terminal:
+            winners = [node.player] #the expanded node already ends the game
+        elif rollouts == 1:
+            winners = [rollout(state, 3 - node.player)]
+        else:
+            winners = batch_rollouts(state, 3 - node.player, rollouts, rng)
 
-        player_roll = node.player
+        # a won or full board is proven, the proof can make its ancestors proven (MCTS-Solver)
+        if node.proven is None and (terminal or node.action_notExp == []):
+            node.proven = WIN if terminal else DRAW
+            backup_proof(node)
 
-        result = 0
+        result, squares = score_winners(winners, MaxPiece) #for the agent i.e. the player looking for max wins
 
-        while get_player_actions(state, 3- player_roll, action) and result != 1 and result != -0.1: #check here if win or loss already occured
+        # backpropagation
+        while node is not None:
+            node.update(result, len(winners), squares)
+            node = node.parent
 
-            player_roll  = 3 - player_roll
-            action = random.choice(get_player_actions(state, player_roll, action))
+        # back to the root position
+        for action in reversed(path):
+            state.undo(action)
 
-            apply_player_action(state,action, player_roll)
+        if budget.exhausted(added): break
 
-            result = check_result(state, MaxPiece, action) #check if the agent won or lost i.e. the player looking for max wins
+    return root
 
-        # backpropagation
-        while node is not None:
-            node.update(result)
-            node = node.parent
 
-        duration = time.clock() - start
-        if duration > timeout: break
+def grow_tree_parallel(root: Node, board: np.ndarray, MaxPiece: BoardPiece, timeout: Union[float, SearchBudget], threads: int = 2,
+                       rollouts: int = 1, virtual_loss: int = 1, policy: Optional[SelectionPolicy] = None,
+                       seed: Union[int, np.random.SeedSequence, None] = None) -> Node:
+    '''
+    tree parallelisation: `threads` threads run MCTS iterations on the one tree below `root` until `timeout`
+    seconds have passed or a SearchBudget shared by the threads is used up (iterations already running when the
+    budget runs out are finished). Selection, expansion and backpropagation hold a lock on the tree, the simulation runs
+    without it on the thread's own board. While a thread simulates below a node, every node on its path
+    counts `virtual_loss` extra visits without wins, so the other threads are steered to other branches.
+    With numba the simulations run in the compiled rollout kernels, which release the GIL, so they overlap
+    (rollouts > 1 gives the kernels more work per lock); without numba only numpy in batch_rollouts releases it.
+    :param board: the board at the root
+    :param MaxPiece: the player the results are counted for
+    :param seed: every thread gets its own child of SeedSequence(seed), fresh entropy if None (the order in which
+    the threads update the tree still varies, so a seeded search is not reproducible)
+    :return: the root
+    '''
+
+    lock = threading.Lock()
+    budget = as_budget(timeout)
+    added = [0] #nodes added to the tree
+    done = threading.Event()
+    if root.proven is not None:
+        done.set()
+
+    def worker(seed: np.random.SeedSequence):
+        state = Bitboard.from_array(board)
+        rng = np.random.default_rng(seed)
+        choice = random.Random(int(seed.generate_state(1)[0])).choice
+        while not done.is_set():
+            path = []
+            with lock:
+                node = root
+                node.visits += virtual_loss
+                while node.action_notExp == [] and node.childNodes != []:
+                    node = node.selection(policy)
+                    state.apply(node.action, node.player)
+                    path.append(node.action)
+                    node.visits += virtual_loss
+                if node.action_notExp != []:
+                    action = choice(node.action_notExp)
+                    node = node.expansion(action, state)
+                    path.append(action)
+                    node.visits += virtual_loss
+                    added[0] += 1
+                terminal = node.action is not None and state.is_win(node.player)
+                if node.proven is None and (terminal or node.action_notExp == []):
+                    node.proven = WIN if terminal else DRAW
+                    backup_proof(node)
+
+            # simulation, outside of the lock
+            if terminal:
+                winners = [node.player]
+            elif JIT_ENABLED:
+                winners = rollout_nogil(state, 3 - node.player, rng, rollouts)
+            elif rollouts == 1:
+                winners = [rollout(state, 3 - node.player, rng.random)]
+            else:
+                winners = batch_rollouts(state, 3 - node.player, rollouts, rng)
+
+            result, squares = score_winners(winners, MaxPiece)
+
+            with lock:
+                while node is not None:
+                    node.visits -= virtual_loss
+                    node.update(result, len(winners), squares)
+                    node = node.parent
+                if budget.exhausted(added[0]) or root.proven is not None:
+                    done.set()
+
+            for action in reversed(path):
+                state.undo(action)
+
+    seeds = (seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)).spawn(threads)
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in seeds]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return root
+
+
+def _root_statistics(board: np.ndarray, player: BoardPiece, timeout: Union[float, SearchBudget], rollouts: int,
+                     seed: np.random.SeedSequence, policy: Optional[SelectionPolicy]) -> list:
+    '''
+    worker of root_parallel_search: grows an independent tree and returns (action, wins, visits, squares, proven)
+    of the root children
+    :param seed: child SeedSequence of this worker, seeds random (expansion, single rollouts) and the numpy generator
+    '''
+    random.seed(int(seed.generate_state(1)[0]))
+    root = Node(board=board, player=3 - player)
+    grow_tree(root, Bitboard.from_array(board), player, timeout, rollouts, np.random.default_rng(seed), policy)
+    return [(child.action, child.wins, child.visits, child.squares, child.proven) for child in root.childNodes]
+
+
+def root_parallel_search(board: np.ndarray, player: BoardPiece, timeout: Union[float, SearchBudget], rollouts: int = 1, workers: int = 2,
+                         policy: Optional[SelectionPolicy] = None, executor: Optional[ProcessPoolExecutor] = None,
+                         seed: Union[int, np.random.SeedSequence, None] = None) -> Node:
+    '''
+    root parallelisation: grows `workers` independent trees in a process pool for the same budget
+    (every worker gets its own copy of a SearchBudget) and merges the wins and visits of their root children
+    :param executor: process pool to search in (e.g. MCTSState.executor), a pool is started for this search if None
+    :param seed: every worker gets its own child of SeedSequence(seed), fresh entropy if None
+    :return: a root node whose children hold the merged statistics (without subtrees)
+    '''
+    seeds = (seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)).spawn(workers)
+    arguments = ([board] * workers, [player] * workers, [timeout] * workers, [rollouts] * workers, seeds, [policy] * workers)
+    if executor is not None:
+        results = list(executor.map(_root_statistics, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_root_statistics, *arguments))
+
+    root = Node(board=board, player=3 - player)
+    children = {}
+    for statistics in results:
+        for action, wins, visits, squares, proven in statistics:
+            if action not in children:
+                children[action] = Node(action=action, player=player, parent=root,
+                                        board=apply_player_action(board, action, player, copy=True))
+                root.childNodes.append(children[action])
+            children[action].update(wins, visits, squares)
+            if proven is not None:
+                children[action].proven = proven
+            root.update(wins, visits, squares)
+    root.action_notExp = [action for action in root.action_notExp if action not in children]
+    return root
+
+
+def _pool_search(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState], timeout: Union[float, SearchBudget],
+                 rollouts: int, node_cap: int, policy: SelectionPolicy, rng: np.random.Generator
+                 ) -> Tuple[PlayerAction, Optional[SavedState], dict]:
+    '''monte_carlo_tree_search on a NodePool, also returns the counts of the SearchStats of the move'''
+
+    pool = saved_state.advance(board) if isinstance(saved_state, PoolState) else None
+    if pool is None or pool.capacity != node_cap:
+        pool = NodePool(board, 3 - player, node_cap)
+    state = Bitboard.from_array(board)
+
+    #check immediate win
+
+    for action in state.legal_actions():
+        state.apply(action, player)
+        won = state.is_win(player)
+        state.undo(action)
+        if won:
+            return action, saved_state, {}
+
+    budget = as_budget(timeout)
+    visits = int(pool.visits[0])
+    grow_pool(pool, state, player, budget, rollouts, rng, policy)
+    counts = {'nodes': budget.iteration, 'rollouts': int(pool.visits[0]) - visits, 'tree_size': pool.size,
+              'depth': pool.depth()}
+
+    children = pool.children(0)
+    visited = [child for child in children if pool.visits[child] > 0]
+    chosen_child = max(visited, key=lambda child: (SOLVED_RANK.get(pool.proven[child], 0), pool.wins[child] / pool.visits[child]))
+    action = PlayerAction(pool.action[chosen_child])
+
+    state.apply(int(action), player)
+    pool.reroot(chosen_child, state.to_array()) #becomes the root of the tree kept for the next move
+    return action, PoolState(pool, pool.root_board), counts
+
+
+# main function for the Monte Carlo Tree Search
+def monte_carlo_tree_search(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState], timeout: Union[float, SearchBudget] = 10,
+                            rollouts: int = 1, workers: int = 1, threads: int = 1,
+                            node_cap: Optional[int] = None,
+                            policy: Union[str, SelectionPolicy] = 'ucb1', endgame_empty: int = 12,
+                            metrics: Optional[MetricsHook] = None, seed: Optional[int] = None
+                            ) -> Tuple[PlayerAction, Optional[SavedState]]:
 
-    choose_fnct = lambda child: child.wins / child.visits
-    chosen_child = sorted(root.childNodes, key=choose_fnct)[::-1]  #change order from highest to largest
+    '''
+    4 step tree search algorithm:
+     1. Selection
+     2. Expansion
+     3. Simulation
+     4. Bakpropagation
+
+    :param board:
+    :param player:
+    :param saved_state: MCTSState of the agent's previous move, its tree is reused if the board follows from it
+    :param timeout: seconds for the search, or a SearchBudget limiting the time, iterations or new tree nodes
+    :param rollouts: number of random playouts per expanded leaf, more than one are simulated together by batch_rollouts
+    :param workers: number of processes for root parallelisation (see root_parallel_search), 1 searches in this process;
+    the merged tree has no subtrees, so the next move starts a new tree. The process pool is kept in the returned
+    MCTSState for the next moves, MCTSState.close shuts it down
+    :param threads: number of threads searching the one tree (see grow_tree_parallel), 1 searches without threads
+    :param node_cap: keep the tree in a NodePool of at most `node_cap` nodes instead of Node objects,
+    when the pool is full the tree stops growing (only for the search in this process without threads). The pool needs
+    room for the root and all its children, a ValueError is raised if `node_cap` is smaller than BOARD_COLS + 1
+    :param policy: selection policy, a SelectionPolicy (e.g. UCB1(c=2, tie_break='random')) or the name of
+    one with the default settings: 'ucb1', 'ucb1-tuned' or 'puct'
+    :param endgame_empty: with at most this many empty cells the position is solved exactly by an EndgameSolver
+    instead of searched (0 never solves), the saved state is then returned unchanged
+    :param metrics: called with the SearchStats of the move (see agents.metrics), which are also stored as
+    saved_state.stats; nodes counts the MCTS iterations of this move (summed over the processes with workers > 1),
+    tree_size and depth describe the searched tree before it is cut down to the chosen move
+    :param seed: seeds random (which chooses the expanded moves and the single rollouts) and the numpy generators of
+    the batched rollouts, the threads and the processes; with an iteration budget and without threads the move is
+    then reproducible. None leaves random as it is and uses fresh entropy
+    :return: the chosen action and an MCTSState (PoolState with node_cap) holding the subtree below it
+    '''
+
+    if node_cap is not None and node_cap < BOARD_COLS + 1:
+        raise ValueError(f"node_cap {node_cap} leaves no room for the children of the root, use at least {BOARD_COLS + 1}")
+
+    start = time.perf_counter()
+    finish = lambda action, saved_state, **counts: (action, report(
+        SearchStats('mcts', player, action, time.perf_counter() - start, **counts), saved_state, metrics))
+
+    empty = board.size - np.count_nonzero(board)
+    if empty <= endgame_empty:
+        solver = EndgameSolver(endgame_empty, table_size=2**16)
+        action, _ = solver.best_move(board, player)
+        return finish(action, saved_state, nodes=solver.nodes, depth=empty)
+
+    policy = get_policy(policy)
+    seed_sequence = np.random.SeedSequence(seed)
+    if seed is not None:
+        random.seed(int(seed_sequence.generate_state(1)[0]))
+    rng_seed, parallel_seed = seed_sequence.spawn(2)
+    rng = np.random.default_rng(rng_seed)
+    if node_cap is not None and workers == 1 and threads == 1:
+        action, saved_state, counts = _pool_search(board, player, saved_state, timeout, rollouts, node_cap, policy, rng)
+        return finish(action, saved_state, **counts)
+
+    MinPiece = 3 - player
+    MaxPiece = player
+
+    root = saved_state.advance(board) if isinstance(saved_state, MCTSState) else None
+    if root is None:
+        root= Node(board=board, player=MinPiece)
+    state = Bitboard.from_array(board) #the one board walked (and restored) by every iteration
+
+    #check immediate win
 
-    return chosen_child[0].action, saved_state #choose largest element
+    for action in state.legal_actions():
+        state.apply(action, MaxPiece)
+        won = state.is_win(MaxPiece)
+        state.undo(action)
+        if won:
+            return finish(action, saved_state)
+
+    budget = as_budget(timeout)
+    visits = root.visits
+    pool = saved_state.pool if isinstance(saved_state, MCTSState) else None
+    if workers > 1:
+        holder = MCTSState(root, board, pool)
+        root = root_parallel_search(board, player, budget, rollouts, workers, policy, holder.executor(workers),
+                                    parallel_seed)
+        pool = holder.pool
+        visits, iterations = 0, -(-root.visits // rollouts) #the budget is copied to the processes
+    elif threads > 1:
+        grow_tree_parallel(root, board, MaxPiece, budget, threads, rollouts, policy=policy, seed=parallel_seed)
+    else:
+        grow_tree(root, state, MaxPiece, budget, rollouts, rng, policy)
+    if workers == 1:
+        iterations = budget.iteration
+
+    choose_fnct = lambda child: (SOLVED_RANK.get(child.proven, 0), child.wins / child.visits)
+    chosen_child = max(root.childNodes, key=choose_fnct) #proven win or child with the largest average result
+
+    chosen_child.parent = None #becomes the root of the tree kept for the next move
+    state.apply(chosen_child.action, MaxPiece)
+
+    tree_size, depth = tree_shape(root)
+    return finish(chosen_child.action, MCTSState(chosen_child, state.to_array(), pool), nodes=iterations,
+                  rollouts=root.visits - visits, tree_size=tree_size, depth=depth)
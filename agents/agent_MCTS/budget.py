@@ -0,0 +1,61 @@
+import time
+from typing import Optional, Union
+
+
+class SearchBudget:
+    '''
+    limits an MCTS search by wall clock time, by the number of iterations or by the number of new tree nodes,
+    the search stops at the first limit reached (limits that are None are not checked)
+    timeout: seconds, measured with time.perf_counter
+    iterations: number of MCTS iterations, with a seeded random generator this makes a search reproducible
+    nodes: number of nodes added to the tree
+    check_every: the clock is read every `check_every` iterations only, so the time limit can be exceeded
+    by up to check_every - 1 iterations
+    iteration, nodes_added: iterations run and nodes added by the search since it started
+    '''
+
+    def __init__(self, timeout: Optional[float] = None, iterations: Optional[int] = None, nodes: Optional[int] = None,
+                 check_every: int = 16):
+        if timeout is None and iterations is None and nodes is None:
+            raise ValueError("A search budget needs a timeout, an iteration or a node limit")
+        if check_every < 1:
+            raise ValueError("check_every must be positive")
+        self.timeout = timeout
+        self.iterations = iterations
+        self.nodes = nodes
+        self.check_every = check_every
+        self.start()
+
+    def start(self):
+        '''starts counting iterations and time, called by the search'''
+        self.iteration = 0
+        self.nodes_added = 0
+        self.started = time.perf_counter()
+        self.deadline = None if self.timeout is None else self.started + self.timeout
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def exhausted(self, nodes: int = 0) -> bool:
+        '''
+        counts one finished iteration and returns True when the search has to stop
+        :param nodes: the number of nodes the search added to the tree so far
+        '''
+        self.iteration += 1
+        self.nodes_added = nodes
+        if self.iterations is not None and self.iteration >= self.iterations:
+            return True
+        if self.nodes is not None and nodes >= self.nodes:
+            return True
+        if self.deadline is not None and self.iteration % self.check_every == 0:
+            return time.perf_counter() > self.deadline
+        return False
+
+
+def as_budget(budget: Union[float, SearchBudget]) -> SearchBudget:
+    '''returns the budget itself (started again) or a time budget of `budget` seconds'''
+    if isinstance(budget, SearchBudget):
+        budget.start()
+        return budget
+    return SearchBudget(timeout=budget)
@@ -0,0 +1,105 @@
+import abc
+import math
+import numpy as np
+from typing import Optional, Union
+
+from agents.common import BOARD_ROWS, BOARD_COLS
+from agents.windows import CELL_WINDOWS
+
+# number of lines of four through every cell, a move landing on a cell gets this prior weight in PUCT
+CELL_PRIORS = np.array([len(windows) for windows in CELL_WINDOWS], dtype=np.float64).reshape(BOARD_ROWS, BOARD_COLS)
+
+
+def move_priors(heights: list, actions: list) -> np.ndarray:
+    '''
+    prior weights of the `actions` on a board with the column `heights`: the number of lines of four
+    through the cell each piece lands on, so central and low moves are preferred
+    '''
+    return CELL_PRIORS[[heights[action] for action in actions], actions]
+
+
+class SelectionPolicy(abc.ABC):
+    '''
+    Selection step of MCTS: scores the children of a node from arrays of their statistics and returns the best one,
+    subclasses define the scores
+    c: exploration constant
+    tie_break: which of the children with the largest score is selected, 'first', 'last' or 'random'
+    rng: numpy random generator for tie_break='random'
+    '''
+
+    def __init__(self, c: float = 1.0, tie_break: str = 'last', rng: Optional[np.random.Generator] = None):
+        if tie_break not in ('first', 'last', 'random'):
+            raise ValueError(f"Unknown tie break {tie_break!r}, use 'first', 'last' or 'random'")
+        self.c = c
+        self.tie_break = tie_break
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    @abc.abstractmethod
+    def scores(self, wins: np.ndarray, visits: np.ndarray, squares: np.ndarray, priors: np.ndarray,
+               parent_visits: int) -> np.ndarray:
+        '''the score of every child (same parameters as select), the largest one is selected'''
+
+    def select(self, wins: np.ndarray, visits: np.ndarray, squares: np.ndarray, priors: np.ndarray,
+               parent_visits: int, allowed: Optional[np.ndarray] = None) -> int:
+        '''
+        :param wins: summed results of every child
+        :param visits: number of simulations through every child (all positive)
+        :param squares: summed squared results of every child
+        :param priors: prior weight of every child (only used by PUCT)
+        :param parent_visits: number of simulations through the node
+        :param allowed: boolean mask of the children that can be selected, all if None
+        :return: the index of the selected child
+        '''
+        scores = self.scores(wins, visits, squares, priors, parent_visits)
+        if allowed is not None:
+            scores = np.where(allowed, scores, -np.inf)
+        if self.tie_break == 'first':
+            return int(scores.argmax())
+        if self.tie_break == 'last':
+            return len(scores) - 1 - int(scores[::-1].argmax())
+        best = np.flatnonzero(scores == scores.max())
+        return int(best[0] if len(best) == 1 else self.rng.choice(best))
+
+
+class UCB1(SelectionPolicy):
+    '''UCB1: wins/visits + c * sqrt(log(parent visits) / visits), with c=1 the original Node.selection'''
+
+    def scores(self, wins, visits, squares, priors, parent_visits):
+        return wins / visits + self.c * np.sqrt(math.log(parent_visits) / visits)
+
+
+class UCB1Tuned(SelectionPolicy):
+    '''
+    UCB1-Tuned: like UCB1, but the exploration term uses the variance of the results of a child,
+    wins/visits + c * sqrt(log(parent visits) / visits * min(1/4, variance + sqrt(2 log(parent visits) / visits)))
+    '''
+
+    def scores(self, wins, visits, squares, priors, parent_visits):
+        log_parent = math.log(parent_visits)
+        mean = wins / visits
+        variance = squares / visits - mean * mean + np.sqrt(2 * log_parent / visits)
+        return mean + self.c * np.sqrt(log_parent / visits * np.minimum(0.25, variance))
+
+
+class PUCT(SelectionPolicy):
+    '''
+    PUCT: wins/visits + c * prior * sqrt(parent visits) / (1 + visits), the priors are normalised over the children
+    (see move_priors for the prior weight of a move)
+    '''
+
+    def scores(self, wins, visits, squares, priors, parent_visits):
+        return wins / visits + self.c * priors / priors.sum() * math.sqrt(parent_visits) / (1 + visits)
+
+
+POLICIES = {'ucb1': UCB1, 'ucb1-tuned': UCB1Tuned, 'puct': PUCT}
+
+
+def get_policy(policy: Union[str, SelectionPolicy, None]) -> SelectionPolicy:
+    '''returns the policy itself or a policy with the default settings for its name in POLICIES (None is UCB1)'''
+    if policy is None:
+        return UCB1()
+    if isinstance(policy, SelectionPolicy):
+        return policy
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown selection policy {policy!r}, use one of {', '.join(POLICIES)}")
+    return POLICIES[policy]()
@@ -0,0 +1,279 @@
+import numpy as np
+import random
+from typing import Optional, Union
+
+from agents.common import PlayerAction, BoardPiece, SavedState, Bitboard, moved_cell
+from agents.agent_MCTS.rollout import rollout, batch_rollouts, score_winners, LEGAL_COLUMNS
+from agents.agent_MCTS.budget import SearchBudget, as_budget
+from agents.agent_MCTS.solver import WIN, DRAW, UNPROVEN, backup_pool_proof
+from agents.agent_MCTS.policy import SelectionPolicy, UCB1, move_priors
+
+
+class NodePool:
+    '''
+    MCTS tree stored as a struct of arrays instead of one Node object per node: node i is entry i of every array.
+    The arrays are allocated once for `capacity` nodes, only the board at the root is stored (root_board),
+    the board of any other node is rebuilt from the moves on its path, see path and board.
+    visits, wins, squares: statistics of the node, the results are counted for the root player (as in Node)
+    prior: prior weight of the action into the node (see move_priors)
+    parent: index of the parent node, -1 for the root
+    action: the column played into the node, -1 for the root
+    player: the player who moved into the node
+    first_child, n_children: the children of a node take n_children consecutive slots from first_child,
+    one per legal column, allocated together when the node is expanded first (first_child is -1 before)
+    untried: bit mask of the columns whose child has not been expanded yet
+    terminal: the move into the node won the game
+    proven: WIN, DRAW or LOSS for the player of the node once the result is known (see solver.py), else UNPROVEN
+    When the pool is full, no children are allocated any more and the search keeps simulating from the leaves
+    it reaches (full counts how often that happened).
+    '''
+
+    def __init__(self, board: np.ndarray, player: BoardPiece, capacity: int = 2**20):
+        '''
+        :param board: the board at the root
+        :param player: the player who moved into the root, i.e. the opponent of the player to move
+        :param capacity: the maximum number of nodes
+        '''
+        if capacity < 1:
+            raise ValueError("The node pool needs room for at least the root")
+        self.capacity = capacity
+        self.root_board = board
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.wins = np.zeros(capacity, dtype=np.float64)
+        self.squares = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.ones(capacity, dtype=np.float32)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.action = np.full(capacity, -1, dtype=np.int8)
+        self.player = np.zeros(capacity, dtype=np.int8)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int8)
+        self.untried = np.zeros(capacity, dtype=np.uint8)
+        self.terminal = np.zeros(capacity, dtype=bool)
+        self.proven = np.full(capacity, UNPROVEN, dtype=np.int8)
+        self.player[0] = player
+        self.size = 1 #the root
+        self.full = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def children(self, node: int) -> range:
+        '''indices of the allocated children of `node`'''
+        first = self.first_child[node]
+        return range(first, first + self.n_children[node]) if first >= 0 else range(0)
+
+    def child(self, node: int, action: PlayerAction) -> Optional[int]:
+        '''index of the child of `node` reached by `action`, None if it is not allocated'''
+        for child in self.children(node):
+            if self.action[child] == action:
+                return child
+        return None
+
+    def allocate(self, node: int, actions: list, priors: Optional[np.ndarray] = None) -> bool:
+        '''
+        allocates one child per legal action of `node`, all of them untried
+        :param priors: prior weight of every action, 1 if None
+        :return: False if the pool has no room for them
+        '''
+        first = self.size
+        if first + len(actions) > self.capacity:
+            self.full += 1
+            return False
+        children = slice(first, first + len(actions))
+        self.parent[children] = node
+        self.action[children] = actions
+        self.prior[children] = 1 if priors is None else priors
+        self.player[children] = 3 - self.player[node]
+        self.first_child[node] = first if actions else 0
+        self.n_children[node] = len(actions)
+        self.untried[node] = sum(1 << action for action in actions)
+        self.size += len(actions)
+        return True
+
+    def select(self, node: int, policy: SelectionPolicy) -> int:
+        '''
+        Selection step of MCTS: the child of `node` chosen by `policy` from the statistics of all children,
+        proven children are skipped
+        '''
+        first = self.first_child[node]
+        children = slice(first, first + self.n_children[node])
+        allowed = self.proven[children] == UNPROVEN
+        return first + policy.select(self.wins[children], self.visits[children], self.squares[children],
+                                     self.prior[children], self.visits[node], allowed if allowed.any() else None)
+
+    def path(self, node: int) -> list:
+        '''the actions from the root to `node`'''
+        actions = []
+        while self.parent[node] >= 0:
+            actions.append(int(self.action[node]))
+            node = int(self.parent[node])
+        return actions[::-1]
+
+    def board(self, node: int) -> Bitboard:
+        '''rebuilds the board of `node` by playing its path from the board at the root'''
+        state = Bitboard.from_array(self.root_board)
+        player = int(self.player[0])
+        for action in self.path(node):
+            player = 3 - player
+            state.apply(action, player)
+        return state
+
+    def update(self, path: list, result: float, visits: int = 1, squares: Optional[float] = None):
+        '''backpropagation: adds the result to all nodes of the path (node indices from the root)'''
+        self.wins[path] += result
+        self.visits[path] += visits
+        self.squares[path] += result * result if squares is None else squares
+
+    def depth(self) -> int:
+        '''number of moves from the root to the deepest node'''
+        nodes = np.arange(1, self.size)
+        depth = 0
+        while len(nodes):
+            nodes = self.parent[nodes]
+            nodes = np.unique(nodes[nodes > 0]) #the children of the root are done
+            depth += 1
+        return depth
+
+    def reroot(self, node: int, board: np.ndarray):
+        '''
+        makes `node` the root, keeping its subtree (with all statistics) and dropping the rest of the tree:
+        the subtree is copied to the front of the arrays in breadth first order, so children stay consecutive
+        :param board: the board of `node`
+        '''
+        order = [node]
+        i = 0
+        while i < len(order):
+            order.extend(self.children(order[i]))
+            i += 1
+        order = np.array(order)
+        size = len(order)
+        index = np.full(self.capacity, -1, dtype=np.int32)
+        index[order] = np.arange(size) #new index of every kept node
+
+        first_child = self.first_child[order]
+        allocated = first_child >= 0
+        first_child[allocated] = index[first_child[allocated]]
+        first_child[allocated & (self.n_children[order] == 0)] = 0
+        self.first_child[:size] = first_child
+        self.parent[:size] = index[self.parent[order]]
+        self.parent[0] = -1
+        for array in (self.visits, self.wins, self.squares, self.prior, self.action, self.player, self.n_children, self.untried,
+                      self.terminal, self.proven):
+            array[:size] = array[order]
+        self.action[0] = -1
+
+        # reset the freed slots
+        self.visits[size:self.size] = 0
+        self.wins[size:self.size] = 0
+        self.squares[size:self.size] = 0
+        self.first_child[size:self.size] = -1
+        self.n_children[size:self.size] = 0
+        self.untried[size:self.size] = 0
+        self.terminal[size:self.size] = False
+        self.proven[size:self.size] = UNPROVEN
+        self.size = size
+        self.root_board = board
+
+
+class PoolState(SavedState):
+    '''
+    state of the MCTS agent kept between its moves when the tree lives in a NodePool
+    pool: the tree, its root is the position after the agent's last move
+    board: the playing board after the agent's last move
+    '''
+
+    def __init__(self, pool: NodePool, board: np.ndarray):
+        self.pool = pool
+        self.board = board
+
+    def advance(self, board: np.ndarray) -> Optional[NodePool]:
+        '''
+        moves the root of the pool to `board`, i.e. the position after the opponent's reply to the agent's last move
+        :return: the pool or None if the board does not follow from the saved one
+        '''
+        cell = moved_cell(self.board, board)
+        if cell is None:
+            return None
+        child = self.pool.child(0, cell[1])
+        if child is None or self.pool.visits[child] == 0:
+            return None
+        self.pool.reroot(child, board)
+        return self.pool
+
+
+def grow_pool(pool: NodePool, state: Bitboard, MaxPiece: BoardPiece, timeout: Union[float, SearchBudget], rollouts: int = 1,
+              rng: Optional[np.random.Generator] = None, policy: Optional[SelectionPolicy] = None) -> NodePool:
+    '''
+    grow_tree for a NodePool: runs MCTS iterations on the tree in `pool` until `timeout` seconds have passed,
+    or until a SearchBudget is used up (its node limit counts the slots allocated by this search)
+    :param state: the board at the root, walked by every iteration and restored afterwards
+    :param MaxPiece: the player the results are counted for
+    :param policy: selection policy, UCB1 if None
+    :return: the pool
+    '''
+
+    if policy is None:
+        policy = UCB1()
+    if rng is None and rollouts > 1:
+        rng = np.random.default_rng()
+
+    budget = as_budget(timeout)
+    size = len(pool)
+    while pool.proven[0] == UNPROVEN: #stop when the result of the root is known
+
+        node = 0
+        path = [0] #nodes from the root, their actions are applied to state
+        player = int(pool.player[0]) #the player who moved into node
+
+        while not pool.terminal[node]:
+            if pool.first_child[node] < 0:
+                actions = state.legal_actions()
+                if not pool.allocate(node, actions, move_priors(state.heights, actions)):
+                    break #the pool is full, simulate from this leaf
+
+            # expansion
+            untried = int(pool.untried[node])
+            player = 3 - player
+            if untried:
+                action = random.choice(LEGAL_COLUMNS[untried])
+                pool.untried[node] = untried ^ (1 << action)
+                node = pool.child(node, action)
+                state.apply(action, player)
+                path.append(node)
+                pool.terminal[node] = state.is_win(player)
+                break
+
+            if pool.n_children[node] == 0:
+                player = 3 - player
+                break #draw
+
+            # selection
+            node = pool.select(node, policy)
+            state.apply(int(pool.action[node]), player)
+            path.append(node)
+
+        # simulation
+        if pool.terminal[node]:
+            winners = [player] #the move into the node already ends the game
+        elif rollouts == 1:
+            winners = [rollout(state, 3 - player)]
+        else:
+            winners = batch_rollouts(state, 3 - player, rollouts, rng)
+
+        # a won or full board is proven, the proof can make its ancestors proven (MCTS-Solver)
+        if pool.proven[node] == UNPROVEN and (pool.terminal[node] or (pool.first_child[node] >= 0 and pool.n_children[node] == 0)):
+            pool.proven[node] = WIN if pool.terminal[node] else DRAW
+            backup_pool_proof(pool, path)
+
+        result, squares = score_winners(winners, MaxPiece) #for the agent i.e. the player looking for max wins
+
+        # backpropagation
+        pool.update(path, result, len(winners), squares)
+
+        # back to the root position
+        for node in reversed(path[1:]):
+            state.undo(int(pool.action[node]))
+
+        if budget.exhausted(len(pool) - size): break
+
+    return pool
@@ -0,0 +1,133 @@
+import random
+import numpy as np
+from typing import Callable, Optional
+
+from agents.common import BoardPiece, Bitboard, NO_PLAYER, PLAYER1, PLAYER2, BOARD_ROWS, BOARD_COLS, BITBOARD_HEIGHT
+from agents.common import bitboard_connected_four, BITBOARD_RUN_SHIFTS
+from agents.jit import JIT_ENABLED, rollout_kernel, rollouts_kernel
+
+# LEGAL_COLUMNS[free] lists the columns whose bit is set in the column mask `free`, precomputed for all 2**7 masks
+LEGAL_COLUMNS = [tuple(col for col in range(BOARD_COLS) if free >> col & 1) for free in range(1 << BOARD_COLS)]
+
+
+def rollout(bitboard: Bitboard, player: BoardPiece, rand: Callable[[], float] = random.random) -> BoardPiece:
+    '''
+    Simulation step of MCTS: plays uniformly random moves, starting with `player`, until the game ends.
+    Works on copies of the two bit masks and the column heights only (the bitboard is not changed):
+    the legal columns come from a bit mask of the non-full columns and LEGAL_COLUMNS, and after every
+    move only the mask of the player who moved is checked for a win.
+    :param bitboard: the position to start from, which must not be won already
+    :param player: the player to move
+    :param rand: source of random numbers in [0, 1)
+    :return: the winner, or NO_PLAYER for a draw
+    '''
+    player = int(player)
+    mover = bitboard.masks[player]
+    waiting = bitboard.masks[3 - player]
+    heights = bitboard.heights.copy()
+    free = 0
+    for col in range(BOARD_COLS):
+        if heights[col] < BOARD_ROWS:
+            free |= 1 << col
+
+    while free:
+        cols = LEGAL_COLUMNS[free]
+        col = cols[int(rand() * len(cols))]
+        height = heights[col]
+        mover |= 1 << (col * BITBOARD_HEIGHT + height)
+        heights[col] = height + 1
+        if height + 1 == BOARD_ROWS:
+            free ^= 1 << col #column is full now
+        if bitboard_connected_four(mover):
+            return BoardPiece(player)
+        mover, waiting = waiting, mover
+        player = 3 - player
+
+    return NO_PLAYER
+
+
+def score_winners(winners, MaxPiece: BoardPiece) -> tuple:
+    '''
+    the result of simulations for MaxPiece: a win counts 1, a loss -0.1 and a draw 0
+    :param winners: the winner of every simulation (NO_PLAYER for a draw)
+    :return: the summed results and the summed squared results
+    '''
+    wins = np.count_nonzero(np.equal(winners, MaxPiece))
+    losses = np.count_nonzero(np.equal(winners, 3 - MaxPiece))
+    return wins * 1 + losses * -0.1, wins * 1 + losses * 0.01
+
+
+# shift amounts of bitboard_connected_four as an array (one row per direction) for the kernels of agents/jit.py
+RUN_SHIFTS = np.array(BITBOARD_RUN_SHIFTS, dtype=np.int64)
+
+
+def rollout_nogil(bitboard: Bitboard, player: BoardPiece, rng: np.random.Generator, n: int = 1) -> np.ndarray:
+    '''
+    `n` rollouts like `rollout` on the compiled rollout kernels of agents/jit.py, which release the GIL,
+    so that threads simulate at the same time (see grow_tree_parallel). Without numba the kernels run as
+    Python and are slower than `rollout`.
+    :param rng: numpy random generator, draws the random numbers of all moves up front
+    :return: the winner of every playout (NO_PLAYER for a draw)
+    '''
+    player = int(player)
+    heights = np.array(bitboard.heights, dtype=np.int64)
+    rand = rng.random((n, BOARD_ROWS * BOARD_COLS - bitboard.n_moves))
+    if n == 1:
+        return np.array([rollout_kernel(bitboard.masks[player], bitboard.masks[3 - player], heights, player, rand[0],
+                                        BOARD_ROWS, BITBOARD_HEIGHT, RUN_SHIFTS)])
+    return rollouts_kernel(bitboard.masks[player], bitboard.masks[3 - player], heights, player, rand,
+                           BOARD_ROWS, BITBOARD_HEIGHT, RUN_SHIFTS)
+
+
+# shift amounts of bitboard_connected_four as numpy scalars, so that the shifts stay within uint64
+_RUN_SHIFTS = [[np.uint64(shift) for shift in shifts] for shifts in BITBOARD_RUN_SHIFTS]
+
+
+def batch_rollouts(bitboard: Bitboard, player: BoardPiece, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    '''
+    Simulation step of MCTS for many playouts at once: plays `n` independent uniformly random games from `bitboard`,
+    starting with `player`. The games are stacked into numpy arrays, the column heights (n, cols) and one uint64
+    bitboard mask per player and game, and advanced together: one vectorised step samples a legal column for every
+    game still running, places the pieces and checks the masks of the movers with shift-and-mask.
+    :param bitboard: the position to start from, which must not be won already (it is not changed)
+    :param player: the player to move
+    :param n: the number of playouts
+    :param rng: numpy random generator
+    :return: the winner of every playout (NO_PLAYER for a draw)
+    '''
+    if rng is None:
+        rng = np.random.default_rng()
+    player = int(player)
+    masks = np.zeros((3, n), dtype=np.uint64) #indexed by BoardPiece and game
+    masks[PLAYER1] = bitboard.masks[PLAYER1]
+    masks[PLAYER2] = bitboard.masks[PLAYER2]
+    heights = np.repeat(np.array([bitboard.heights]), n, axis=0)
+    winners = np.full(n, NO_PLAYER, dtype=BoardPiece)
+    games = np.arange(n) #games still being played
+
+    while len(games):
+        legal = heights[games] < BOARD_ROWS
+        playable = legal.any(axis=1)
+        if not playable.all():
+            games, legal = games[playable], legal[playable] #full boards are draws
+            if not len(games):
+                break
+
+        # uniform choice among the legal columns: the largest random number, illegal columns get -1
+        cols = np.where(legal, rng.random(legal.shape), -1.0).argmax(axis=1)
+        rows = heights[games, cols]
+        heights[games, cols] += 1
+        mover = masks[player, games] | np.left_shift(np.uint64(1), (cols * BITBOARD_HEIGHT + rows).astype(np.uint64))
+        masks[player, games] = mover
+
+        won = np.zeros(len(games), dtype=bool)
+        for shifts in _RUN_SHIFTS:
+            m = mover
+            for shift in shifts:
+                m = m & (m >> shift)
+            won |= m != 0
+        winners[games[won]] = player
+        games = games[~won]
+        player = 3 - player
+
+    return winners
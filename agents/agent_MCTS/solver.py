@@ -0,0 +1,56 @@
+from typing import Optional
+
+# proven results of a node, for the player who moved into the node
+WIN = 1
+DRAW = 0
+LOSS = -1
+UNPROVEN = 2 #NodePool.proven of a node whose result is not known (Node.proven is None)
+
+
+def proven_value(values: list, complete: bool) -> Optional[int]:
+    '''
+    MCTS-Solver: the proven result of a node from the proven results of its children, which are counted for
+    the other player. A child the opponent wins with is a loss, and if all moves are expanded and proven,
+    the node gets the negated best result of the opponent.
+    :param values: proven results of the children (None if not proven)
+    :param complete: all legal moves of the node have been expanded
+    :return: the proven result or None
+    '''
+    if WIN in values:
+        return LOSS
+    if complete and values and None not in values:
+        return -max(values)
+    return None
+
+
+def backup_proof(node) -> None:
+    '''propagates the proven result of the Node `node` to its ancestors, as long as they become proven'''
+    node = node.parent
+    while node is not None and node.proven is None:
+        value = proven_value([child.proven for child in node.childNodes], node.action_notExp == [])
+        if value is None:
+            break
+        node.proven = value
+        node = node.parent
+
+
+def backup_pool_proof(pool, path: list) -> None:
+    '''
+    backup_proof for a NodePool, all children of a pool node are allocated together
+    :param path: node indices from the root to the newly proven node
+    '''
+    for node in reversed(path[:-1]):
+        if pool.proven[node] != UNPROVEN:
+            break
+        first = pool.first_child[node]
+        values = pool.proven[first:first + pool.n_children[node]]
+        if (values == WIN).any():
+            pool.proven[node] = LOSS
+        elif (values != UNPROVEN).all():
+            pool.proven[node] = -values.max()
+        else:
+            break
+
+
+# order of the root children when choosing the move: proven wins first, proven losses last
+SOLVED_RANK = {WIN: 1, LOSS: -1}
@@ -1,13 +1,21 @@
 from random import randrange, uniform
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 from typing import Optional
-from typing import Tuple
+from typing import Tuple, Union
 
-from scipy.signal.sigtools import _convolve2d
-
-from agents.common import PlayerAction, BoardPiece, SavedState, PLAYER1, PLAYER2, NO_PLAYER, CONNECT_N
+from agents.common import PlayerAction, BoardPiece, SavedState, PLAYER1, PLAYER2, NO_PLAYER, CONNECT_N, BOARD_ROWS, BOARD_COLS
 from agents.common import initialize_game_state, pretty_print_board, apply_player_action, check_end_state
+from agents.common import BoardState, connected_four_at, legal_actions
+from agents.agent_minimax.transposition import TranspositionTable, Bound, ZOBRIST, ZOBRIST_MAX_TO_MOVE, zobrist_hash
+from agents.agent_minimax.ordering import MoveOrdering
+from agents.windows import WINDOWS, WINDOWS_JIT, CELL_WINDOWS, board_windows, connected_n
+from agents.endgame import EndgameSolver
+from agents.jit import JIT_ENABLED, position_value_kernel
+from agents.metrics import SearchStats, MetricsHook, report
 
 
 
@@ -17,65 +25,97 @@ def get_player_actions(board: np.ndarray) -> list:
     returns an array with the possible columns that a player could place a piece in
     '''
 
-    player_actions = []
-    for col in range(board.shape[1]):
-        if np.count_nonzero(board[:,col]) < board.shape[0]:
-            player_actions.append(col)
-    return player_actions
+    return legal_actions(board)
 
 
-def position_value(
-        board: np.ndarray, player: BoardPiece, _last_action: Optional[PlayerAction] = None
-) -> bool:
+# every window is summarised by a code: own pieces + 5 * pieces of the other player, which is unique for every
+# combination and is looked up in WINDOW_SCORES. Only windows that hold pieces of a single player score.
+OWN_SCORES = (0, 0, 10, 50, 200) #by number of own pieces in a window without other pieces
+OTHER_SCORES = (0, 0, -12, -55, -250) #by number of pieces of the other player in a window without own pieces
+WINDOW_SCORES = np.zeros(CONNECT_N * 5 + 1, dtype=np.int64)
+for _own in range(CONNECT_N + 1):
+    WINDOW_SCORES[_own] = OWN_SCORES[_own]
+    WINDOW_SCORES[5 * _own] = OTHER_SCORES[_own]
+WINDOW_SCORE_LIST = WINDOW_SCORES.tolist()
+PIECE_WEIGHTS = {PLAYER1: np.array([0, 1, 5]), PLAYER2: np.array([0, 5, 1])} #window code contribution per BoardPiece
+CENTER_WEIGHTS = {PLAYER1: np.array([0, 10, -5]), PLAYER2: np.array([0, -5, 10])} #value of a piece in the center column
+
+
+def position_values(boards: np.ndarray, player: BoardPiece) -> np.ndarray:
     """
-    Returns the heuristic value to the given plaer of a complete board
+    Returns the heuristic values to the given player of a stack of boards with shape (n, rows, cols),
+    all boards are scored at once in a single pass over all windows
     """
+    n_boards, rows, cols = boards.shape
 
-    board1 = board.copy()
-    board2 = board.copy()
-
-    other_player = BoardPiece(player % 2 + 1)
-    board1[board1 == other_player] = 5
-    board1[board1 == player] = BoardPiece(1)
+    codes = PIECE_WEIGHTS[player][boards.reshape(n_boards, rows * cols)][:, board_windows(boards)].sum(axis=2)
+    value = WINDOW_SCORES[codes].sum(axis=1)
 
-    board2[board2 == player] = BoardPiece(5)
-    board2[board2 == other_player] = BoardPiece(1)
+    # scoring central positions
+    value += CENTER_WEIGHTS[player][boards[:, :, cols // 2]].sum(axis=1)
+    return value
 
-    value = 0
 
-    # scoring central positions
-    center = board[:, board.shape[1] // 2]
-    value += (center == player).sum() * 10
-    value += (center == other_player).sum() * -5
+def position_value(
+        board: np.ndarray, player: BoardPiece, _last_action: Optional[PlayerAction] = None
+) -> int:
+    """
+    Returns the heuristic value to the given plaer of a complete board
+    """
+    return int(position_values(board[np.newaxis], player)[0])
 
-    # checking remainin positions
-    for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
-        result = _convolve2d(board1, kernel, 1, 0, 0, BoardPiece(0))
-        for i in result:
-            for sum in i:
-                if sum == CONNECT_N:
-                    value += 200
 
-                if sum == CONNECT_N - 1:
-                    value += 50
+def _position_value_jit(
+        board: np.ndarray, player: BoardPiece, _last_action: Optional[PlayerAction] = None
+) -> int:
+    windows = WINDOWS_JIT if board.shape == (BOARD_ROWS, BOARD_COLS) else np.array(board_windows(board), dtype=np.int64)
+    return int(position_value_kernel(board, windows, PIECE_WEIGHTS[player], WINDOW_SCORES, CENTER_WEIGHTS[player]))
 
-                if sum == CONNECT_N - 2:
-                    value += 10
 
-    for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
-        result = _convolve2d(board2, kernel, 1, 0, 0, 0)
-        for i in result:
-            for sum in i:
-                if sum == CONNECT_N:
-                    value += -250
+if JIT_ENABLED:
+    position_value = _position_value_jit #compiled at import by agents.jit.warm_up
 
-                if sum == CONNECT_N - 1:
-                    value += -55
 
-                if sum == CONNECT_N - 2:
-                    value += -12
+class IncrementalEvaluator:
+    '''
+    keeps the value of position_value(board, player) up to date while pieces are placed and removed,
+    touching only the windows through the changed cell instead of the whole board
+    codes: per window the number of own pieces + 5 * the number of pieces of the other player (see WINDOW_SCORES)
+    value: the current heuristic value
+    '''
 
-    return int(value)
+    def __init__(self, board: np.ndarray, player: BoardPiece):
+        self.player = player
+        self.weights = PIECE_WEIGHTS[player].tolist()
+        self.center_weights = CENTER_WEIGHTS[player].tolist()
+        self.codes = PIECE_WEIGHTS[player][board.reshape(-1)][WINDOWS].sum(axis=1).tolist()
+        self.value = position_value(board, player)
+
+    def place(self, row: int, col: int, piece: BoardPiece):
+        '''updates the value after a piece was placed at board[row, col]'''
+        weight = self.weights[piece]
+        codes = self.codes
+        delta = 0
+        for window in CELL_WINDOWS[row * BOARD_COLS + col]:
+            code = codes[window]
+            codes[window] = code + weight
+            delta += WINDOW_SCORE_LIST[code + weight] - WINDOW_SCORE_LIST[code]
+        if col == BOARD_COLS // 2:
+            delta += self.center_weights[piece]
+        self.value += delta
+
+    def remove(self, row: int, col: int, piece: BoardPiece):
+        '''updates the value after the piece at board[row, col] was removed again'''
+        weight = self.weights[piece]
+        codes = self.codes
+        delta = 0
+        for window in CELL_WINDOWS[row * BOARD_COLS + col]:
+            code = codes[window]
+            codes[window] = code - weight
+            delta += WINDOW_SCORE_LIST[code - weight] - WINDOW_SCORE_LIST[code]
+        if col == BOARD_COLS // 2:
+            delta -= self.center_weights[piece]
+        self.value += delta
 
 
 def check_terminal(
@@ -83,24 +123,8 @@ def check_terminal(
 ) -> bool:
     ''' check if the board is a "terminal" board: a win or a draw'''
 
-    board1 = board.copy()
-    board2 = board.copy()
-
-    board1[board1 == PLAYER1] = NO_PLAYER
-    board1[board1 == PLAYER2] = BoardPiece(1)
-
-    for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
-        result = _convolve2d(board1, kernel, 1, 0, 0, BoardPiece(0))
-        if np.any(result == CONNECT_N):
-            return True
-
-    board2[board2 == PLAYER2] = NO_PLAYER
-    board2[board2 == PLAYER1] = BoardPiece(1)
-
-    for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
-        result = _convolve2d(board2, kernel, 1, 0, 0, BoardPiece(0))
-        if np.any(result == CONNECT_N):
-            return True
+    if connected_n(board, PLAYER1) or connected_n(board, PLAYER2):
+        return True
 
     if np.count_nonzero(board) == board.shape[0] * board.shape[1]:
         return True
@@ -138,75 +162,368 @@ def check_terminal(
 #             value = min(value, minimax(child_board, True, player, depth - 1))
 #         return value
 
-def alphabeta(board: np.ndarray, alpha: np.int8, beta:np.int8, MaximisingPlayer: bool, player: BoardPiece, depth = 4):
+class SearchTimeout(Exception):
+    '''raised inside alphabeta when the deadline of the search has passed'''
+
+
+class SearchContext:
+    '''
+    state shared by all nodes of one search
+    tt: transposition table of already searched positions, None to search without one
+    deadline: time.perf_counter() value after which the search is aborted with SearchTimeout, None for no limit
+    ordering: move ordering used in every node, None for the plain left to right order
+    evaluator: IncrementalEvaluator kept in sync with the searched board, None to call position_value at the leaves
+    nodes: number of nodes searched so far
+    '''
+
+    def __init__(self, tt: Optional[TranspositionTable] = None, deadline: Optional[float] = None,
+                 ordering: Optional[MoveOrdering] = None, evaluator: Optional[IncrementalEvaluator] = None):
+        self.tt = tt
+        self.deadline = deadline
+        self.ordering = ordering
+        self.evaluator = evaluator
+        self.nodes = 0
+
+
+def alphabeta(board: Union[np.ndarray, BoardState], alpha: np.int8, beta:np.int8, MaximisingPlayer: bool, player: BoardPiece, depth = 4,
+              last_move: Optional[Tuple[int, PlayerAction]] = None, context: Optional[SearchContext] = None,
+              key: Optional[int] = None):
 
     '''
     depth limited minimax with alpha-beta pruning:
     returns the value of the given board based on the minimax algorithm with alpha beta pruning
+    board: the playing board, a BoardState is searched in place (every move is undone again), an ndarray is copied once
+    last_move: (row, column) of the piece placed last, so that only the lines through it have to be checked
+    context: per search state such as the transposition table
+    key: Zobrist key of the board, computed from the board if not given
     '''
 
+    state = board if isinstance(board, BoardState) else BoardState(board.copy())
+
     MinPiece = 3 - player.copy()
     MaxPiece = player.copy()
 
-    terminalboard = check_terminal(board)
+    if context is not None:
+        context.nodes += 1
+        if context.deadline is not None and time.perf_counter() > context.deadline:
+            raise SearchTimeout()
+
+    tt = context.tt if context is not None else None
+    ordering = context.ordering if context is not None else None
+    evaluator = context.evaluator if context is not None else None
+    tt_action = None
+    if tt is not None:
+        if key is None:
+            key = zobrist_hash(state.board)
+        tt_key = key ^ ZOBRIST_MAX_TO_MOVE if MaximisingPlayer else key
+        entry = tt.probe(tt_key)
+        if entry is not None:
+            _, tt_depth, tt_value, tt_bound, tt_action, _ = entry
+            # values are scaled with the remaining depth, so only entries of the same depth can replace a search
+            if tt_depth == depth:
+                if tt_bound == Bound.EXACT:
+                    return tt_value
+                if tt_bound == Bound.LOWER and tt_value >= beta:
+                    return tt_value
+                if tt_bound == Bound.UPPER and tt_value <= alpha:
+                    return tt_value
+
+    if last_move is None:
+        terminalboard = check_terminal(state.board)
+    else:
+        mover = MinPiece if MaximisingPlayer else MaxPiece #the player who placed the last piece
+        terminalboard = connected_four_at(state.board, mover, *last_move) or state.is_full()
 
     if depth == 0 or terminalboard == True:
-        return position_value(board,player) * (depth +1)
+        if evaluator is not None:
+            value = evaluator.value * (depth + 1)
+        else:
+            value = position_value(state.board,player) * (depth +1)
+        if tt is not None:
+            tt.store(tt_key, depth, value, Bound.EXACT)
+        return value
+
+    valid_actions = state.legal_actions()
+    if ordering is not None:
+        valid_actions = ordering.order(valid_actions, state.n_moves, MaxPiece if MaximisingPlayer else MinPiece)
+    if tt_action in valid_actions:
+        valid_actions.remove(tt_action)
+        valid_actions.insert(0, tt_action) #best move of an earlier search first
+    alpha_start, beta_start = alpha, beta
+    best_action = None
 
     if MaximisingPlayer:
         value = -999
-        valid_actions = get_player_actions(board)
         for action in valid_actions:
-            child_board = board.copy()
-            child_board = apply_player_action(child_board, action, MaxPiece)
-            value = max(value, alphabeta(child_board, alpha, beta, False, player, depth - 1))
+            row = state.apply(action, MaxPiece)
+            if evaluator is not None:
+                evaluator.place(row, action, MaxPiece)
+            child_key = key ^ ZOBRIST[MaxPiece][row][action] if tt is not None else None
+            child_value = alphabeta(state, alpha, beta, False, player, depth - 1, (row, action), context, child_key)
+            state.undo(action)
+            if evaluator is not None:
+                evaluator.remove(row, action, MaxPiece)
+            if child_value > value:
+                value = child_value
+                best_action = action
             alpha = max(alpha, value)
             if alpha >= beta:
+                if ordering is not None:
+                    ordering.cutoff(action, state.n_moves, depth, MaxPiece)
                 break #β cut-off
-        return value
     else:
         value = 999
-        valid_actions = get_player_actions(board)
         for action in valid_actions:
-            child_board = board.copy()
-            child_board = apply_player_action(child_board, action, MinPiece)
-            value = min(value, alphabeta(child_board, alpha, beta, True, player, depth -1))
+            row = state.apply(action, MinPiece)
+            if evaluator is not None:
+                evaluator.place(row, action, MinPiece)
+            child_key = key ^ ZOBRIST[MinPiece][row][action] if tt is not None else None
+            child_value = alphabeta(state, alpha, beta, True, player, depth -1, (row, action), context, child_key)
+            state.undo(action)
+            if evaluator is not None:
+                evaluator.remove(row, action, MinPiece)
+            if child_value < value:
+                value = child_value
+                best_action = action
             beta = min(beta, value)
             if beta <= alpha:
+                if ordering is not None:
+                    ordering.cutoff(action, state.n_moves, depth, MinPiece)
                 break #α cut-off
-        return value
 
+    if tt is not None:
+        if value <= alpha_start:
+            bound = Bound.UPPER
+        elif value >= beta_start:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        tt.store(tt_key, depth, value, bound, best_action)
+    return value
 
 
-def generate_smart_move(
-    board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]
-) -> Tuple[PlayerAction, Optional[SavedState]]:
 
+class MinimaxState(SavedState):
     '''
-    chooses a column (i.e. "action") that corresponds to the smallest value the other players can force the player to receive
+    state of the minimax agent kept between its moves
+    tt: transposition table reused by the searches of all moves (None without one)
+    depths: depth reached by the search of every move played so far
+    nodes: number of nodes searched for every move played so far
+    endgame: EndgameSolver used once few cells are empty, created with the first solved position
+    pool: process pool of parallel_search_root with the best root value shared by its processes (see executor)
     '''
 
-    best_value = -999
-
-    valid_actions = get_player_actions(board) #get the possible moves
-    best_action = 0
+    def __init__(self, tt_size: int = 2**16):
+        self.tt = TranspositionTable(tt_size) if tt_size > 0 else None
+        self.depths = []
+        self.nodes = []
+        self.endgame = None
+        self.pool = None
+
+    def executor(self, workers: int) -> Tuple[ProcessPoolExecutor, multiprocessing.Value]:
+        '''returns the process pool with `workers` processes and the shared best root value, started at the first call'''
+        if self.pool is None or self.pool[0] != workers:
+            self.close()
+            tt_size = self.tt.size if self.tt is not None else 0
+            shared_alpha = multiprocessing.Value('i', -999)
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared_alpha, tt_size))
+            self.pool = (workers, executor, shared_alpha)
+        return self.pool[1], self.pool[2]
+
+    def close(self):
+        '''shuts the process pool down'''
+        if self.pool is not None:
+            self.pool[1].shutdown()
+            self.pool = None
+
+
+def search_root(state: BoardState, player: BoardPiece, valid_actions: list, depth: int, context: SearchContext,
+                key: int) -> Tuple[PlayerAction, int]:
+    '''
+    searches every root move in the given order with a full window
+    :return: the first action with the highest value and that value
+    '''
 
+    best_value = -999
+    best_action = valid_actions[0]
 
     for action in valid_actions:
         alpha = -999
         beta = 999
 
-        temp_board = board.copy()
-        apply_player_action(temp_board, action, player)
+        row = state.apply(action, player)
+        if context.evaluator is not None:
+            context.evaluator.place(row, action, player)
         #value = position_value(temp_board, player)
         #value = minimax(temp_board, False, player)
-        value = alphabeta(temp_board, alpha, beta, False, player)
+        value = alphabeta(state, alpha, beta, False, player, depth, (row, action), context,
+                          key ^ ZOBRIST[player][row][action])
+        state.undo(action)
+        if context.evaluator is not None:
+            context.evaluator.remove(row, action, player)
         if value > best_value:
             best_value = value
             best_action = action
-    print(type(best_action))
 
-    return best_action, saved_state
+    return best_action, best_value
+
+
+# state of a worker process of parallel_search_root, set by _init_worker
+_shared_alpha = None #best root value found by any process so far
+_worker_tt = None #transposition table kept by the process for all root moves it searches
+
+
+def _init_worker(shared_alpha: multiprocessing.Value, tt_size: int):
+    global _shared_alpha, _worker_tt
+    _shared_alpha = shared_alpha
+    _worker_tt = TranspositionTable(tt_size) if tt_size > 0 else None
+
+
+def _search_root_move(board: np.ndarray, player: BoardPiece, action: PlayerAction, depth: int,
+                      deadline: Optional[float]) -> Tuple[PlayerAction, Optional[int], int]:
+    '''
+    worker of parallel_search_root: searches one root move with the window (best value so far - 1, 999)
+    and shares its value if it is better
+    :return: the action, its value (None if the deadline passed) and the number of searched nodes
+    '''
+    state = BoardState(board.copy())
+    if _worker_tt is not None:
+        _worker_tt.new_search()
+    context = SearchContext(_worker_tt, deadline, MoveOrdering(), IncrementalEvaluator(state.board, player))
+    row = state.apply(action, player)
+    context.evaluator.place(row, action, player)
+    try:
+        value = alphabeta(state, _shared_alpha.value - 1, 999, False, player, depth, (row, action), context,
+                          zobrist_hash(state.board))
+    except SearchTimeout:
+        return action, None, context.nodes
+    with _shared_alpha.get_lock():
+        if value > _shared_alpha.value:
+            _shared_alpha.value = value
+    return action, value, context.nodes
+
+
+def parallel_search_root(state: BoardState, player: BoardPiece, valid_actions: list, depth: int, context: SearchContext,
+                         key: int, saved_state: MinimaxState, workers: int) -> Tuple[PlayerAction, int]:
+    '''
+    search_root over a process pool. The first action is searched here to get a good bound (young brothers wait),
+    the other actions are distributed over the processes of the pool, which share the best value found so far.
+    Every action is searched with the window (best value - 1, 999): an action that cannot reach the best value
+    fails low and is not chosen, an action that reaches it gets its exact value. Ties are broken by the order of
+    valid_actions, so the same action is returned as by search_root.
+    :return: the first action with the highest value and that value
+    '''
+
+    best_action, best_value = search_root(state, player, valid_actions[:1], depth, context, key)
+    if len(valid_actions) == 1:
+        return best_action, best_value
+
+    executor, shared_alpha = saved_state.executor(workers)
+    shared_alpha.value = best_value
+    futures = [executor.submit(_search_root_move, state.board, player, action, depth, context.deadline)
+               for action in valid_actions[1:]]
+    values = {}
+    for future in futures:
+        action, value, nodes = future.result()
+        context.nodes += nodes
+        values[action] = value
+    if None in values.values():
+        raise SearchTimeout()
+
+    for action in valid_actions[1:]:
+        if values[action] > best_value:
+            best_value = values[action]
+            best_action = action
+
+    return best_action, best_value
+
+
+def generate_smart_move(
+    board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState], depth: int = 4,
+    time_budget: Optional[float] = None, max_depth: Optional[int] = None, tt_size: int = 2**16,
+    ordering: Optional[MoveOrdering] = None, endgame_empty: int = 12, workers: int = 1,
+    metrics: Optional[MetricsHook] = None
+) -> Tuple[PlayerAction, Optional[SavedState]]:
+
+    '''
+    chooses a column (i.e. "action") that corresponds to the smallest value the other players can force the player to receive
+    depth: search depth below the root moves when no time budget is given
+    time_budget: seconds available for the move; the search is then deepened iteratively (starting at depth 1)
+    until the budget is used up or max_depth (default: all empty cells) is completed, and the best move of the
+    deepest completed iteration is played. Every iteration searches the previous best move first.
+    tt_size: number of entries of the transposition table kept in the returned MinimaxState, 0 to disable it
+    ordering: move ordering below the root moves, by default center-out with killer moves and history table
+    endgame_empty: with at most this many empty cells the position is solved exactly by an EndgameSolver
+    instead of searched (0 never solves), the depth reached is then the number of empty cells
+    workers: number of processes searching the root moves (see parallel_search_root), the pool is kept in
+    saved_state; the chosen move is the same as with one process
+    metrics: called with the SearchStats of the move (see agents.metrics), which are also stored as saved_state.stats
+    The depth reached is appended to saved_state.depths and the number of searched nodes to saved_state.nodes.
+    '''
+
+    start = time.perf_counter()
+    if not isinstance(saved_state, MinimaxState):
+        saved_state = MinimaxState(tt_size)
+    if saved_state.tt is not None:
+        saved_state.tt.new_search()
+
+    state = BoardState(board.copy()) #searched in place by all root moves
+
+    empty = board.size - state.n_moves
+    if empty <= endgame_empty:
+        if saved_state.endgame is None:
+            saved_state.endgame = EndgameSolver(endgame_empty)
+        nodes = saved_state.endgame.nodes
+        best_action, _ = saved_state.endgame.best_move(board, player)
+        saved_state.depths.append(empty)
+        saved_state.nodes.append(saved_state.endgame.nodes - nodes)
+        stats = SearchStats('minimax', player, best_action, time.perf_counter() - start, saved_state.nodes[-1], depth=empty)
+        return best_action, report(stats, saved_state, metrics)
+
+    context = SearchContext(saved_state.tt, ordering=ordering if ordering is not None else MoveOrdering(),
+                            evaluator=IncrementalEvaluator(state.board, player))
+    key = zobrist_hash(state.board)
+    valid_actions = state.legal_actions() #get the possible moves
+    tt = saved_state.tt
+    probes, hits = (tt.probes, tt.hits) if tt is not None else (0, 0)
+
+    if time_budget is None:
+        if workers > 1:
+            best_action, _ = parallel_search_root(state, player, valid_actions, depth, context, key, saved_state, workers)
+        else:
+            best_action, _ = search_root(state, player, valid_actions, depth, context, key)
+        depth_reached = depth
+    else:
+        deadline = time.perf_counter() + time_budget
+        depth_limit = board.size - state.n_moves - 1 #deeper searches cannot find anything new
+        if max_depth is not None:
+            depth_limit = min(depth_limit, max_depth)
+        best_action, depth_reached = valid_actions[0], 0
+        for iteration_depth in range(1, max(depth_limit, 1) + 1):
+            try:
+                if workers > 1:
+                    best_action, _ = parallel_search_root(state, player, valid_actions, iteration_depth, context, key,
+                                                          saved_state, workers)
+                else:
+                    best_action, _ = search_root(state, player, valid_actions, iteration_depth, context, key)
+            except SearchTimeout:
+                break #the unfinished iteration is discarded
+            depth_reached = iteration_depth
+            valid_actions.remove(best_action)
+            valid_actions.insert(0, best_action) #principal variation first in the next iteration
+            context.deadline = deadline #the first iteration always completes
+            if time.perf_counter() >= deadline:
+                break
+
+    saved_state.depths.append(depth_reached)
+    saved_state.nodes.append(context.nodes)
+
+    tt_hit_rate = None
+    if tt is not None:
+        tt_hit_rate = (tt.hits - hits) / (tt.probes - probes) if tt.probes > probes else 0.0
+    stats = SearchStats('minimax', player, best_action, time.perf_counter() - start, context.nodes,
+                        tt_hit_rate=tt_hit_rate, depth=depth_reached)
+    return best_action, report(stats, saved_state, metrics)
 
 
 
@@ -217,6 +534,60 @@ def generate_smart_move(
 
 # old, slower functions below
 
+# def position_value(
+#         board: np.ndarray, player: BoardPiece, _last_action: Optional[PlayerAction] = None
+# ) -> bool:
+#     """
+#     Returns the heuristic value to the given plaer of a complete board
+#     """
+#
+#     board1 = board.copy()
+#     board2 = board.copy()
+#
+#     other_player = BoardPiece(player % 2 + 1)
+#     board1[board1 == other_player] = 5
+#     board1[board1 == player] = BoardPiece(1)
+#
+#     board2[board2 == player] = BoardPiece(5)
+#     board2[board2 == other_player] = BoardPiece(1)
+#
+#     value = 0
+#
+#     # scoring central positions
+#     center = board[:, board.shape[1] // 2]
+#     value += (center == player).sum() * 10
+#     value += (center == other_player).sum() * -5
+#
+#     # checking remainin positions
+#     for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
+#         result = _convolve2d(board1, kernel, 1, 0, 0, BoardPiece(0))
+#         for i in result:
+#             for sum in i:
+#                 if sum == CONNECT_N:
+#                     value += 200
+#
+#                 if sum == CONNECT_N - 1:
+#                     value += 50
+#
+#                 if sum == CONNECT_N - 2:
+#                     value += 10
+#
+#     for kernel in (col_kernel, row_kernel, dia_l_kernel, dia_r_kernel):
+#         result = _convolve2d(board2, kernel, 1, 0, 0, 0)
+#         for i in result:
+#             for sum in i:
+#                 if sum == CONNECT_N:
+#                     value += -250
+#
+#                 if sum == CONNECT_N - 1:
+#                     value += -55
+#
+#                 if sum == CONNECT_N - 2:
+#                     value += -12
+#
+#     return int(value)
+
+
 # def window_value(window: np.ndarray, player: BoardPiece) -> int:
 #     """
 #     Returns the heuristic value of "CONNECT_N" sequential pieces of the board (here a "window") to the player,
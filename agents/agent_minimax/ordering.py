@@ -0,0 +1,52 @@
+from agents.common import PlayerAction, BoardPiece, BOARD_ROWS, BOARD_COLS
+
+# columns from the center outwards: central columns take part in the most lines of four
+CENTER_ORDER = sorted(range(BOARD_COLS), key=lambda col: abs(col - BOARD_COLS // 2))
+
+
+class MoveOrdering:
+    '''
+    orders the moves searched by alphabeta (the move stored in the transposition table is still searched first)
+    center: start from the static center-out order instead of left to right
+    killers: number of killer moves remembered per ply, i.e. moves that caused a cut-off in a sibling node,
+    which are searched first (0 to disable)
+    history: sort the moves by the history table, which adds depth**2 for a move of a player
+    whenever it causes a cut-off anywhere in the tree
+    Use MoveOrdering(center=False, killers=0, history=False) for the plain left to right order.
+    '''
+
+    def __init__(self, center: bool = True, killers: int = 2, history: bool = True):
+        self.center = center
+        self.killers = killers
+        self.history = history
+        self.center_rank = [CENTER_ORDER.index(col) for col in range(BOARD_COLS)]
+        self.killer_moves = [[] for _ in range(BOARD_ROWS * BOARD_COLS + 1)]  # indexed by the number of pieces on the board
+        self.history_table = [[0] * BOARD_COLS for _ in range(3)]  # indexed by BoardPiece and column
+
+    def order(self, actions: list, ply: int, player: BoardPiece) -> list:
+        '''
+        :param actions: the legal actions
+        :param ply: the number of pieces on the board
+        :param player: the player to move
+        :return: the actions in the order they should be searched
+        '''
+        if self.center:
+            actions = sorted(actions, key=self.center_rank.__getitem__)
+        if self.history:
+            history = self.history_table[player]
+            actions = sorted(actions, key=lambda action: -history[action])  # stable, ties keep the previous order
+        if self.killers:
+            killers = [action for action in self.killer_moves[ply] if action in actions]
+            if killers:
+                actions = killers + [action for action in actions if action not in killers]
+        return actions
+
+    def cutoff(self, action: PlayerAction, ply: int, depth: int, player: BoardPiece):
+        '''called by alphabeta when `action` of `player` caused a cut-off with `depth` plies left'''
+        if self.killers:
+            killers = self.killer_moves[ply]
+            if action not in killers:
+                killers.insert(0, action)
+                del killers[self.killers:]
+        if self.history:
+            self.history_table[player][action] += depth * depth
@@ -0,0 +1,91 @@
+import numpy as np
+from enum import Enum
+from typing import Optional
+
+from agents.common import PlayerAction, BoardPiece, BOARD_ROWS, BOARD_COLS, NO_PLAYER
+
+
+class Bound(Enum):
+    EXACT = 0
+    LOWER = 1  # the stored value is a lower bound (the search failed high)
+    UPPER = -1  # the stored value is an upper bound (the search failed low)
+
+
+# one random 64 bit key per player and cell (ZOBRIST[player][row][col]), fixed seed so that keys are reproducible
+_rng = np.random.default_rng(2020)
+ZOBRIST = [
+    [[int(key) for key in row] for row in _rng.integers(1, 2**63, size=(BOARD_ROWS, BOARD_COLS), dtype=np.int64)]
+    for _ in range(3)
+]
+ZOBRIST_MAX_TO_MOVE = int(_rng.integers(1, 2**63, dtype=np.int64))  # xor-ed in when the maximising player is to move
+
+
+def zobrist_hash(board: np.ndarray) -> int:
+    '''
+    returns the Zobrist key of a playing board: the xor of the keys of all occupied cells.
+    Placing (or removing) a piece of `player` at [row, col] changes the key by xor-ing ZOBRIST[player][row][col].
+    '''
+    key = 0
+    for (row, col), piece in np.ndenumerate(board):
+        if piece != NO_PLAYER:
+            key ^= ZOBRIST[piece][row][col]
+    return key
+
+
+class TranspositionTable:
+    '''
+    fixed size hash table of already searched positions, indexed by Zobrist key
+    size: number of slots, every slot holds one entry (key, depth, value, bound, best_move, generation)
+    Replacement: a slot is overwritten by the same position, by an entry from an older search (see new_search)
+    or by a search of at least the same depth, so deep results are not pushed out by leaves.
+    probes/hits/stores/overwrites count the table usage, see hit_rate.
+    '''
+
+    def __init__(self, size: int = 2**16):
+        if size <= 0:
+            raise ValueError("The size of the transposition table must be positive")
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self):
+        '''marks all stored entries as old, so they are replaced first (they are still used when probed)'''
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.probes = self.hits = self.stores = self.overwrites = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def __len__(self) -> int:
+        '''number of occupied slots'''
+        return sum(entry is not None for entry in self.slots)
+
+    def probe(self, key: int) -> Optional[tuple]:
+        '''returns the entry (key, depth, value, bound, best_move, generation) stored for `key` or None'''
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, value: int, bound: Bound, best_move: Optional[PlayerAction] = None):
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is not None:
+            if entry[0] != key and entry[5] == self.generation and entry[1] > depth:
+                return  # keep the deeper result of the current search
+            if entry[0] != key:
+                self.overwrites += 1
+            if best_move is None and entry[0] == key:
+                best_move = entry[4]
+        self.slots[index] = (key, depth, value, bound, best_move, self.generation)
+        self.stores += 1
@@ -1,3 +1,4 @@
+import time
 from random import randrange
 
 import numpy as np
@@ -5,17 +6,20 @@ from typing import Optional
 from typing import Tuple
 
 from agents.common import PlayerAction, BoardPiece, SavedState
+from agents.metrics import SearchStats, MetricsHook, report
 
 def generate_move_random(
-    board: np.ndarray, saved_state: Optional[SavedState]
+    board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState], metrics: Optional[MetricsHook] = None
 ) -> Tuple[PlayerAction, Optional[SavedState]]:
 
     '''Choose a valid, non-full column randomly and return it as `action`'''
 
+    start = time.perf_counter()
     while True:
-        action = randrange(0, board.shape[0])
+        action = PlayerAction(randrange(0, board.shape[1]))
 
         if  np.count_nonzero(board[:, action]) != board.shape[0]:
-            return action, saved_state
+            stats = SearchStats('random', player, action, time.perf_counter() - start)
+            return action, report(stats, saved_state, metrics)
 
 
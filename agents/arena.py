@@ -0,0 +1,229 @@
+import argparse
+import inspect
+import json
+import math
+import random
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union, Tuple
+
+from agents.common import PlayerAction, BoardPiece, SavedState, GenMove, GameState, IllegalMoveError
+from agents.common import PLAYER1, PLAYER2, initialize_game_state, apply_player_action, check_end_state
+from agents.agent_random import generate_move as generate_move_random
+from agents.agent_minimax import generate_move as generate_move_minimax
+from agents.agent_MCTS import generate_move as generate_move_mcts
+
+# headless games between two agents: the first player alternates, games can run in parallel processes and every game
+# is logged move by move. Run `python -m agents.arena mcts minimax --games 20 --workers 4 --kwargs-1 '{"timeout": 1}'`
+
+AGENTS = {'random': generate_move_random, 'minimax': generate_move_minimax, 'mcts': generate_move_mcts}
+
+
+class Contestant:
+    '''
+    an agent taking part in the arena
+    agent: a GenMove or the name of one in AGENTS
+    name: shown in the report and the logs, the name of the agent by default
+    kwargs: keyword arguments passed to the agent at every move (e.g. depth or timeout)
+    An agent with a `seed` parameter (the MCTS agent) gets a seed drawn from np.random for every move,
+    unless kwargs fix one.
+    '''
+
+    def __init__(self, agent: Union[str, GenMove], name: Optional[str] = None, **kwargs):
+        if isinstance(agent, str):
+            if agent not in AGENTS:
+                raise ValueError(f"Unknown agent {agent!r}, use one of {', '.join(AGENTS)}")
+            name = name or agent
+            agent = AGENTS[agent]
+        self.agent = agent
+        self.name = name or agent.__name__
+        self.kwargs = kwargs
+        self.seeded = 'seed' in inspect.signature(agent).parameters and 'seed' not in kwargs
+
+    def generate_move(self, board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]
+                      ) -> Tuple[PlayerAction, Optional[SavedState]]:
+        if self.seeded:
+            return self.agent(board, player, saved_state, seed=int(np.random.randint(2**31)), **self.kwargs)
+        return self.agent(board, player, saved_state, **self.kwargs)
+
+
+class GameRecord:
+    '''
+    result and moves of one game
+    game: index of the game in the tournament
+    first: name of the contestant who moved first (playing PLAYER1)
+    second: name of the other contestant
+    moves: (name, column, seconds taken) of every move in order
+    winner: name of the winner, None for a draw
+    illegal: the game was lost by a move into a full or non existing column
+    '''
+
+    def __init__(self, game: int, first: str, second: str):
+        self.game = game
+        self.first = first
+        self.second = second
+        self.moves = []
+        self.winner: Optional[str] = None
+        self.illegal = False
+
+    def to_dict(self) -> dict:
+        return {'game': self.game, 'first': self.first, 'second': self.second, 'winner': self.winner,
+                'illegal': self.illegal, 'moves': [[name, action, round(seconds, 6)] for name, action, seconds in self.moves]}
+
+
+def play_game(first: Contestant, second: Contestant, game: int = 0, seed: Optional[int] = None) -> GameRecord:
+    '''
+    plays one game, `first` plays PLAYER1
+    :param seed: seed of random and np.random for this game, which also seed the agents with a `seed` parameter
+    (see Contestant). The game is reproducible if the agents are: random and minimax always, MCTS with a
+    SearchBudget of iterations or nodes and without threads. Time budgets and threads are not reproducible.
+    '''
+    random.seed(seed)
+    np.random.seed(seed) #processes of a pool start with the same random state
+    record = GameRecord(game, first.name, second.name)
+    board = initialize_game_state()
+    saved_state = {PLAYER1: None, PLAYER2: None}
+    contestants = {PLAYER1: first, PLAYER2: second}
+    player, other = PLAYER1, PLAYER2
+    while True:
+        contestant = contestants[player]
+        start = time.perf_counter()
+        try:
+            action, saved_state[player] = contestant.generate_move(board.copy(), player, saved_state[player])
+            seconds = time.perf_counter() - start
+            apply_player_action(board, action, player)
+        except IllegalMoveError:
+            record.moves.append((contestant.name, None, time.perf_counter() - start))
+            record.winner = contestants[other].name
+            record.illegal = True
+            break
+        record.moves.append((contestant.name, int(action), seconds))
+        end_state = check_end_state(board, player, action)
+        if end_state != GameState.STILL_PLAYING:
+            if end_state == GameState.IS_WIN:
+                record.winner = contestant.name
+            break
+        player, other = other, player
+    for state in saved_state.values():
+        if hasattr(state, 'close'):
+            state.close() #e.g. the process pool of the minimax agent
+    return record
+
+
+def elo_difference(score: float, n_games: int) -> float:
+    '''
+    the Elo rating difference that makes `score` (points per game, a draw is half a point) the expected score,
+    a score of 0 or 1 is counted as half a game lost or won less so the difference stays finite (0 without games)
+    '''
+    if n_games <= 0:
+        return 0.0
+    score = min(max(score, 0.5 / n_games), 1 - 0.5 / n_games)
+    return -400 * math.log10(1 / score - 1)
+
+
+class ArenaReport:
+    '''
+    results of a tournament between two contestants
+    names: names of the two contestants
+    games: GameRecord of every game, in order
+    wins: number of games won per name
+    draws: number of drawn games
+    '''
+
+    def __init__(self, names: Tuple[str, str], games: list):
+        self.names = names
+        self.games = games
+        self.wins = {name: sum(record.winner == name for record in games) for name in names}
+        self.draws = sum(record.winner is None for record in games)
+
+    @property
+    def score(self) -> float:
+        '''points per game of the first contestant (0.5 without games)'''
+        if not self.games:
+            return 0.5
+        return (self.wins[self.names[0]] + 0.5 * self.draws) / len(self.games)
+
+    @property
+    def elo(self) -> float:
+        '''Elo rating of the first contestant minus the one of the second'''
+        return elo_difference(self.score, len(self.games))
+
+    def latency(self, name: str) -> Tuple[float, float]:
+        '''mean and 95th percentile of the seconds the contestant `name` took per move'''
+        seconds = [move[2] for record in self.games for move in record.moves if move[0] == name]
+        if not seconds:
+            return 0.0, 0.0
+        return float(np.mean(seconds)), float(np.percentile(seconds, 95))
+
+    def to_dict(self) -> dict:
+        report = {'games': len(self.games), 'draws': self.draws, 'score': self.score, 'elo': self.elo, 'contestants': {}}
+        for name in self.names:
+            mean, p95 = self.latency(name)
+            report['contestants'][name] = {'wins': self.wins[name], 'losses': self.wins[self.other(name)],
+                                           'latency_mean': mean, 'latency_p95': p95}
+        return report
+
+    def other(self, name: str) -> str:
+        return self.names[1] if name == self.names[0] else self.names[0]
+
+    def summary(self) -> str:
+        lines = [f"{len(self.games)} games, {self.draws} draws"]
+        for name in self.names:
+            mean, p95 = self.latency(name)
+            lines.append(f"{name}: {self.wins[name]} wins, {self.wins[self.other(name)]} losses, "
+                         f"move time mean {mean:.3f}s p95 {p95:.3f}s")
+        lines.append(f"{self.names[0]} scores {self.score:.3f} per game, Elo difference {self.elo:+.0f}")
+        return "\n".join(lines)
+
+
+def run_arena(contestant_1: Contestant, contestant_2: Contestant, n_games: int = 10, workers: int = 1,
+              log_path: Optional[str] = None, seed: Optional[int] = None) -> ArenaReport:
+    '''
+    plays `n_games` games between the contestants, contestant_1 moves first in the even games
+    :param workers: number of processes the games are played in (the agents must be picklable for more than 1)
+    :param log_path: file the GameRecord of every game is written to, one JSON object per line
+    :param seed: game i is played with the seed seed + i, every game gets fresh random state if None
+    '''
+    if contestant_1.name == contestant_2.name:
+        raise ValueError("The contestants need different names")
+    if n_games < 1:
+        raise ValueError("A tournament needs at least one game")
+    pairings = [(contestant_1, contestant_2) if game % 2 == 0 else (contestant_2, contestant_1) for game in range(n_games)]
+    seeds = [None if seed is None else seed + game for game in range(n_games)]
+    if workers == 1:
+        games = [play_game(first, second, game, seeds[game]) for game, (first, second) in enumerate(pairings)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(play_game, first, second, game, seeds[game])
+                       for game, (first, second) in enumerate(pairings)]
+            games = [future.result() for future in futures]
+
+    if log_path is not None:
+        with open(log_path, 'w') as log:
+            for record in games:
+                log.write(json.dumps(record.to_dict()) + "\n")
+    return ArenaReport((contestant_1.name, contestant_2.name), games)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Plays games between two agents and reports the results")
+    parser.add_argument('agent_1', choices=AGENTS)
+    parser.add_argument('agent_2', choices=AGENTS)
+    parser.add_argument('--kwargs-1', type=json.loads, default={}, help="keyword arguments of agent 1 as JSON")
+    parser.add_argument('--kwargs-2', type=json.loads, default={}, help="keyword arguments of agent 2 as JSON")
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--log', default=None, help="file for the move logs (JSON lines)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    names = (args.agent_1, args.agent_2) if args.agent_1 != args.agent_2 else (args.agent_1 + "-1", args.agent_2 + "-2")
+    report = run_arena(Contestant(args.agent_1, names[0], **args.kwargs_1), Contestant(args.agent_2, names[1], **args.kwargs_2),
+                       args.games, args.workers, args.log, args.seed)
+    print(json.dumps(report.to_dict(), indent=2) if args.json else report.summary())
+
+
+if __name__ == "__main__":
+    main()
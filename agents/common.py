@@ -4,6 +4,8 @@ from enum import Enum
 from typing import Optional
 from typing import Callable, Tuple
 
+from agents.jit import JIT_ENABLED, place_piece_kernel, connected_four_at_kernel, connected_four_kernel, legal_actions_kernel
+
 class SavedState:
     pass
 
@@ -13,6 +15,12 @@ NO_PLAYER = BoardPiece(0)  # board[i, j] == NO_PLAYER where the position is empt
 PLAYER1 = BoardPiece(1)  # board[i, j] == PLAYER1 where player 1 has a piece "0"
 PLAYER2 = BoardPiece(2)  # board[i, j] == PLAYER2 where player 2 has a piece "X"
 CONNECT_N = BoardPiece(4) #number of joined pieces that wins the game
+BOARD_ROWS = 6 #number of rows of the playing board
+BOARD_COLS = 7 #number of columns of the playing board
+
+
+class IllegalMoveError(IndexError):
+    '''raised when a piece is placed into a full (or non existing) column'''
 
 
 class GameState(Enum):
@@ -23,7 +31,7 @@ class GameState(Enum):
 
 def initialize_game_state() -> np.ndarray:
     '''creates the empty playing bord'''
-    return np.zeros((6,7), dtype=BoardPiece)
+    return np.zeros((BOARD_ROWS, BOARD_COLS), dtype=BoardPiece)
 
 board = initialize_game_state()
 board[0,0] = 2 # lower left corner on board
@@ -51,14 +59,13 @@ def pretty_print_board(board: np.ndarray) -> str:
 
 
 def apply_player_action(board: np.ndarray, action: PlayerAction, player: BoardPiece, copy: bool = False) -> np.ndarray:
-    '''applies the player action to the playing board'''
+    '''
+    applies the player action to the playing board
+    raises IllegalMoveError when the chosen column is already full, this will lead to game loss
+    '''
     if copy == True:
        board= board.copy()
-    try:
-        row_index = np.argwhere(board[:,action] == 0)[0]  #searches for the row idx of the first empty position in the chosen column
-        board[row_index,action] = player #places a "BoardPiece" in the chosen position
-    except IndexError:
-        return IndexError #output when no empty row exists, this will lead to game loss
+    place_piece(board, action, player)
 
     return board
 
@@ -89,6 +96,49 @@ def string_to_board(pp_board):
     return board.astype(np.int8)
 
 
+def place_piece(board: np.ndarray, action: PlayerAction, player: BoardPiece) -> int:
+    '''
+    places a piece of `player` in column `action` of the board (in place)
+    :return: the row index the piece landed on, to be handed to connected_four_at
+    '''
+    if not 0 <= action < board.shape[1]:
+        raise IllegalMoveError(f"column {action} does not exist")
+    row_index = int(np.count_nonzero(board[:, action])) #pieces are stacked, so the count is the first empty row
+    if row_index == board.shape[0]:
+        raise IllegalMoveError(f"column {action} is full")
+    board[row_index, action] = player #places a "BoardPiece" in the chosen position
+    return row_index
+
+
+def connected_four_at(board: np.ndarray, player: BoardPiece, row: int, col: int) -> bool:
+    '''
+    Returns True if the piece of `player` at board[row, col] is part of CONNECT_N adjacent pieces.
+    Only the at most 2 * CONNECT_N - 1 cells through the piece are inspected in every direction
+    and nothing is allocated, so this is the check to use right after a move.
+    '''
+    if board[row, col] != player:
+        return False
+    rows, cols = board.shape
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        r, c = row + d_row, col + d_col
+        while count < CONNECT_N and 0 <= r < rows and 0 <= c < cols and board[r, c] == player:
+            count += 1
+            r, c = r + d_row, c + d_col
+        r, c = row - d_row, col - d_col
+        while count < CONNECT_N and 0 <= r < rows and 0 <= c < cols and board[r, c] == player:
+            count += 1
+            r, c = r - d_row, c - d_col
+        if count >= CONNECT_N:
+            return True
+    return False
+
+
+def _column(last_action) -> int:
+    '''the column of `last_action`, a number or an array holding one; only arrays are unwrapped, which is slow'''
+    return int(last_action.flat[0]) if isinstance(last_action, np.ndarray) else int(last_action)
+
+
 def connected_four(board: np.ndarray, player: BoardPiece, last_action: Optional[PlayerAction] = None)-> bool:
     """
     Returns True if there are four adjacent pieces equal to `player` arranged
@@ -96,64 +146,68 @@ def connected_four(board: np.ndarray, player: BoardPiece, last_action: Optional[
     If desired, the last action taken (i.e. last column played) can be provided
     for potential speed optimisation.
     """
-    #get the row index
-    for counter, element in enumerate(board[:, last_action]):
-        if element == 0:
-            row_index = counter - 1
-            break
+    if last_action is None:
+        #no last move known: check the lines through every piece of the player
+        for row, col in zip(*np.nonzero(board == player)):
+            if connected_four_at(board, player, row, col):
+                return True
+        return False
 
+    col = _column(last_action)
+    row = int(np.count_nonzero(board[:, col])) - 1 #the last piece played is the top one of the column
+    if row < 0:
+        return False
+    return bool(connected_four_at(board, player, row, col))
 
-    if np.count_nonzero(board[:, last_action]) == board.shape[0]:
-        row_index = board.shape[0] - 1
 
-    check_position = np.zeros(2)
-    check_position[0] = row_index
-    check_position[1] = last_action
+def moved_cell(old: np.ndarray, new: np.ndarray) -> Optional[Tuple[int, int]]:
+    '''
+    returns (row, column) of the one piece placed on `old` to get `new`,
+    None if the boards differ in anything else (e.g. the game was restarted)
+    '''
+    if old.shape != new.shape:
+        return None
+    changed = np.argwhere(old != new)
+    if len(changed) != 1:
+        return None
+    row, col = changed[0]
+    if old[row, col] != NO_PLAYER:
+        return None
+    return int(row), int(col)
 
-    win_sum = 0
 
+def legal_actions(board: np.ndarray) -> list:
+    '''returns the columns of the playing board that are not full yet'''
+    return np.flatnonzero(board[-1] == NO_PLAYER).tolist() #a column is playable as long as its top cell is empty
 
-    #check for a win in the row of the last action
 
-    for i in board[int(check_position[0]),:]:
-        if i == player:
-            win_sum += 1
-        else:
-            win_sum = 0
-        if win_sum >= 4:
-            return True
-    #check for a win in the column of the last action
-    win_sum = 0
-    for i in board[:, int(check_position[1])]:
-        if i == player:
-            win_sum += 1
-        else:
-            win_sum = 0
-        if win_sum >= 4:
-            return True
-    #check for a win in the normal diagonal the last action falls on
-    win_sum = 0
-    for i in np.diag(board, k = (int(check_position[1])-int(check_position[0]))):
-        if i == player:
-            win_sum += 1
-        else:
-            win_sum = 0
-        if win_sum >= 4:
-            return True
-    # check for a win in the inverse diagonal the last action falls on
-    win_sum = 0
-    for i in np.diag(np.fliplr(board), k = (board.shape[1]-1-int(check_position[1]) - int(check_position[0]))):
-        if i == player:
-            win_sum += 1
-        else:
-            win_sum = 0
-        if win_sum >= 4:
-            return True
+# the same functions on the compiled kernels of agents/jit.py, they replace the ones above when numba is available
 
-    # check if the board is full and the game is a DRAW
+def _place_piece_jit(board: np.ndarray, action: PlayerAction, player: BoardPiece) -> int:
+    row = place_piece_kernel(board, int(action), int(player))
+    if row < 0:
+        raise IllegalMoveError(f"column {action} cannot be played")
+    return row
 
 
-    return False
+def _connected_four_at_jit(board: np.ndarray, player: BoardPiece, row: int, col: int) -> bool:
+    return connected_four_at_kernel(board, int(player), int(row), int(col), int(CONNECT_N))
+
+
+def _connected_four_jit(board: np.ndarray, player: BoardPiece, last_action: Optional[PlayerAction] = None) -> bool:
+    col = -1 if last_action is None else _column(last_action)
+    return connected_four_kernel(board, int(player), col, int(CONNECT_N))
+
+
+def _legal_actions_jit(board: np.ndarray) -> list:
+    return legal_actions_kernel(board).tolist()
+
+
+if JIT_ENABLED:
+    place_piece = _place_piece_jit
+    connected_four_at = _connected_four_at_jit
+    connected_four = _connected_four_jit
+    legal_actions = _legal_actions_jit
 
 
 
@@ -174,6 +228,198 @@ def check_end_state(
 
 
 
+class BoardState:
+    '''
+    playing board together with the fill height of every column, so that placing a piece,
+    listing the legal columns and detecting a full board do not have to look at the board
+    board: the 6x7 playing board, it is used (and changed) in place and not copied
+    heights: the number of pieces in every column, i.e. the row index the next piece lands on
+    n_moves: the number of pieces on the board
+    '''
+
+    __slots__ = ('board', 'heights', 'n_moves')
+
+    def __init__(self, board: Optional[np.ndarray] = None):
+        if board is None:
+            board = initialize_game_state()
+        self.board = board
+        self.heights = [int(height) for height in np.count_nonzero(board, axis=0)]
+        self.n_moves = sum(self.heights)
+
+    def copy(self) -> 'BoardState':
+        state = BoardState.__new__(BoardState)
+        state.board = self.board.copy()
+        state.heights = self.heights.copy()
+        state.n_moves = self.n_moves
+        return state
+
+    def can_play(self, action: PlayerAction) -> bool:
+        return 0 <= action < len(self.heights) and self.heights[action] < self.board.shape[0]
+
+    def legal_actions(self) -> list:
+        '''returns the columns that are not full yet'''
+        rows = self.board.shape[0]
+        return [col for col, height in enumerate(self.heights) if height < rows]
+
+    def is_full(self) -> bool:
+        return self.n_moves == self.board.size
+
+    def apply(self, action: PlayerAction, player: BoardPiece) -> int:
+        '''
+        places a piece of `player` in column `action` (in place)
+        :return: the row index the piece landed on
+        '''
+        if not self.can_play(action):
+            raise IllegalMoveError(f"column {action} cannot be played")
+        row = self.heights[action]
+        self.board[row, action] = player
+        self.heights[action] = row + 1
+        self.n_moves += 1
+        return row
+
+    def undo(self, action: PlayerAction) -> None:
+        '''removes the top piece of column `action` (reverts `apply`)'''
+        row = self.heights[action] - 1
+        self.board[row, action] = NO_PLAYER
+        self.heights[action] = row
+        self.n_moves -= 1
+
+
+# Bitboard representation
+# Every column uses BOARD_ROWS + 1 bits of an integer: bit col * (BOARD_ROWS + 1) + row is set
+# when board[row, col] holds a piece of the player owning the mask. The extra bit on top of every
+# column always stays empty, so shifting a mask never carries pieces from one column into the next.
+
+BITBOARD_HEIGHT = BOARD_ROWS + 1 #number of bits used per column
+BITBOARD_DIRECTIONS = (1, BITBOARD_HEIGHT, BITBOARD_HEIGHT - 1, BITBOARD_HEIGHT + 1) #vertical, horizontal, both diagonals
+BITBOARD_FULL = sum(((1 << BOARD_ROWS) - 1) << (col * BITBOARD_HEIGHT) for col in range(BOARD_COLS)) #all playable bits
+
+
+def _run_shifts(direction: int) -> tuple:
+    '''shift amounts that turn a mask into the mask of runs of CONNECT_N pieces, doubling the run length each step'''
+    shifts, run = [], 1
+    while run < CONNECT_N:
+        step = min(run, int(CONNECT_N) - run)
+        shifts.append(step * direction)
+        run += step
+    return tuple(shifts)
+
+
+BITBOARD_RUN_SHIFTS = tuple(_run_shifts(direction) for direction in BITBOARD_DIRECTIONS)
+
+
+def bitboard_connected_four(mask: int) -> bool:
+    '''
+    Returns True if the bit mask of one player contains CONNECT_N adjacent pieces
+    in a horizontal, vertical or diagonal line (shift-and-mask, no loops over the board).
+    '''
+    for shifts in BITBOARD_RUN_SHIFTS:
+        m = mask
+        for shift in shifts:
+            m &= m >> shift
+        if m:
+            return True
+    return False
+
+
+class Bitboard:
+    '''
+    compact alternative to the 6x7 ndarray playing board
+    masks: bit mask of the pieces of each player, indexed with the BoardPiece (masks[NO_PLAYER] stays 0)
+    heights: the number of pieces in every column, i.e. the row index the next piece lands on
+    n_moves: the number of pieces on the board
+    '''
+
+    __slots__ = ('masks', 'heights', 'n_moves')
+
+    def __init__(self):
+        self.masks = [0, 0, 0]
+        self.heights = [0] * BOARD_COLS
+        self.n_moves = 0
+
+    @classmethod
+    def from_array(cls, board: np.ndarray) -> 'Bitboard':
+        '''converts an ndarray playing board into a bitboard'''
+        bitboard = cls()
+        for (row, col), piece in np.ndenumerate(board):
+            if piece != NO_PLAYER:
+                bitboard.masks[int(piece)] |= 1 << (col * BITBOARD_HEIGHT + row)
+        bitboard.heights = [int(height) for height in np.count_nonzero(board, axis=0)]
+        bitboard.n_moves = sum(bitboard.heights)
+        return bitboard
+
+    @classmethod
+    def from_string(cls, pp_board: str) -> 'Bitboard':
+        '''converts the printable string of a board into a bitboard'''
+        return cls.from_array(string_to_board(pp_board))
+
+    def to_array(self) -> np.ndarray:
+        '''converts the bitboard back into an ndarray playing board'''
+        board = initialize_game_state()
+        for player in (PLAYER1, PLAYER2):
+            mask = self.masks[player]
+            for col in range(BOARD_COLS):
+                for row in range(self.heights[col]):
+                    if mask >> (col * BITBOARD_HEIGHT + row) & 1:
+                        board[row, col] = player
+        return board
+
+    def __str__(self) -> str:
+        return pretty_print_board(self.to_array())
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Bitboard) and self.masks == other.masks and self.heights == other.heights
+
+    def copy(self) -> 'Bitboard':
+        bitboard = Bitboard()
+        bitboard.masks = self.masks.copy()
+        bitboard.heights = self.heights.copy()
+        bitboard.n_moves = self.n_moves
+        return bitboard
+
+    def can_play(self, action: PlayerAction) -> bool:
+        return 0 <= action < BOARD_COLS and self.heights[action] < BOARD_ROWS
+
+    def legal_actions(self) -> list:
+        '''returns the columns that are not full yet'''
+        return [col for col in range(BOARD_COLS) if self.heights[col] < BOARD_ROWS]
+
+    def apply(self, action: PlayerAction, player: BoardPiece) -> int:
+        '''
+        places a piece of `player` in column `action` (in place)
+        :return: the bit of the placed piece (e.g. to update a hash); `undo` only needs the column `action`
+        '''
+        if not self.can_play(action):
+            raise IllegalMoveError(f"column {action} cannot be played")
+        move = 1 << (action * BITBOARD_HEIGHT + self.heights[action])
+        self.masks[player] |= move
+        self.heights[action] += 1
+        self.n_moves += 1
+        return move
+
+    def undo(self, action: PlayerAction) -> None:
+        '''removes the top piece of column `action` (reverts `apply`)'''
+        self.heights[action] -= 1
+        self.n_moves -= 1
+        move = ~(1 << (action * BITBOARD_HEIGHT + self.heights[action]))
+        self.masks[PLAYER1] &= move
+        self.masks[PLAYER2] &= move
+
+    def is_win(self, player: BoardPiece) -> bool:
+        return bitboard_connected_four(self.masks[player])
+
+    def is_draw(self) -> bool:
+        '''True if the board is full and nobody has won'''
+        return self.n_moves == BOARD_ROWS * BOARD_COLS and not (self.is_win(PLAYER1) or self.is_win(PLAYER2))
+
+    def end_state(self, player: BoardPiece) -> GameState:
+        '''same as check_end_state for the ndarray board'''
+        if self.is_win(player):
+            return GameState.IS_WIN
+        if self.n_moves == BOARD_ROWS * BOARD_COLS:
+            return GameState.IS_DRAW
+        return GameState.STILL_PLAYING
+
 
 GenMove = Callable[
     [np.ndarray, BoardPiece, Optional[SavedState]],  # Arguments for the generate_move function
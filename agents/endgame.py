@@ -0,0 +1,157 @@
+import numpy as np
+from typing import Optional, Tuple, Union
+
+from agents.common import PlayerAction, BoardPiece, BOARD_ROWS, BOARD_COLS, Bitboard
+from agents.common import BITBOARD_HEIGHT, BITBOARD_FULL
+
+CELLS = BOARD_ROWS * BOARD_COLS
+BOTTOM = sum(1 << (col * BITBOARD_HEIGHT) for col in range(BOARD_COLS)) #lowest cell of every column
+COLUMN_MASKS = [((1 << BOARD_ROWS) - 1) << (col * BITBOARD_HEIGHT) for col in range(BOARD_COLS)]
+SEARCH_ORDER = sorted(range(BOARD_COLS), key=lambda col: abs(col - BOARD_COLS // 2)) #center-out
+
+
+def _winning_cells(position: int, mask: int) -> int:
+    '''
+    returns the empty cells (as a bit mask) that complete a line of four for the player with the pieces `position`
+    :param mask: all pieces on the board
+    '''
+    cells = (position << 1) & (position << 2) & (position << 3) #vertical
+    for shift in (BITBOARD_HEIGHT, BITBOARD_HEIGHT - 1, BITBOARD_HEIGHT + 1): #horizontal and both diagonals
+        pair = (position << shift) & (position << 2 * shift)
+        cells |= pair & (position << 3 * shift)
+        cells |= pair & (position >> shift)
+        pair = (position >> shift) & (position >> 2 * shift)
+        cells |= pair & (position << shift)
+        cells |= pair & (position >> 3 * shift)
+    return cells & (BITBOARD_FULL ^ mask)
+
+
+def _truncate_half(value: int) -> int:
+    '''value / 2 rounded towards zero'''
+    return -(-value // 2) if value < 0 else value // 2
+
+
+class EndgameSolver:
+    '''
+    exact solver for positions with few empty cells: negamax with alpha-beta on bitboards, only searching moves that
+    do not lose at once, a transposition table of upper bounds and null window searches that narrow the score.
+    The score of a position is positive if the player to move wins, 0 for a draw and negative if it loses;
+    the sooner the game is won, the larger the score: (cells + 1 - moves) // 2 for a win with the moves-th piece.
+    max_empty: the agents use the solver when at most this many cells are empty
+    table_size: number of slots of the transposition table, which is kept between calls
+    nodes: number of positions searched, summed over all calls
+    '''
+
+    def __init__(self, max_empty: int = 12, table_size: int = 2**20):
+        if table_size <= 0:
+            raise ValueError("The size of the transposition table must be positive")
+        self.max_empty = max_empty
+        self.table_size = table_size
+        self.table = [None] * table_size
+        self.nodes = 0
+
+    def applies(self, board: Union[np.ndarray, Bitboard]) -> bool:
+        '''True if the board has at most max_empty empty cells'''
+        n_moves = board.n_moves if isinstance(board, Bitboard) else np.count_nonzero(board)
+        return CELLS - n_moves <= self.max_empty
+
+    def _negamax(self, position: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        '''
+        :param position: pieces of the player to move, who cannot win with the next move
+        :param mask: all pieces on the board
+        :param moves: number of pieces on the board
+        :return: the exact score if it is inside (alpha, beta), else a bound on the side of the window it is on
+        '''
+        self.nodes += 1
+        possible = (mask + BOTTOM) & BITBOARD_FULL
+        threats = _winning_cells(position ^ mask, mask)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                return -((CELLS - moves) // 2) #two threats of the opponent cannot both be blocked
+            possible = forced
+        possible &= ~(threats >> 1) #playing below a threat of the opponent lets it win
+        if not possible:
+            return -((CELLS - moves) // 2)
+        if moves >= CELLS - 2:
+            return 0 #draw, neither player can win with the last two pieces
+
+        lower = -((CELLS - 2 - moves) // 2) #the opponent cannot win with its next move
+        if alpha < lower:
+            alpha = lower
+            if alpha >= beta:
+                return alpha
+        upper = (CELLS - 1 - moves) // 2 #the player to move cannot win with its next move
+        key = position + mask #unique per position
+        entry = self.table[key % self.table_size]
+        if entry is not None and entry[0] == key:
+            upper = entry[1]
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        for col in SEARCH_ORDER:
+            move = possible & COLUMN_MASKS[col]
+            if move:
+                score = -self._negamax(position ^ mask, mask | move, moves + 1, -beta, -alpha)
+                if score >= beta:
+                    return score
+                if score > alpha:
+                    alpha = score
+
+        self.table[key % self.table_size] = (key, alpha) #alpha is an upper bound of the score
+        return alpha
+
+    def _solve(self, position: int, mask: int, moves: int) -> int:
+        '''the exact score, found by null window searches that halve the interval of possible scores'''
+        if _winning_cells(position, mask) & ((mask + BOTTOM) & BITBOARD_FULL):
+            return (CELLS + 1 - moves) // 2
+        lower = -((CELLS - moves) // 2)
+        upper = (CELLS + 1 - moves) // 2
+        while lower < upper:
+            middle = lower + (upper - lower) // 2
+            if middle <= 0 and _truncate_half(lower) < middle:
+                middle = _truncate_half(lower) #probe closer to zero first, where most scores are
+            elif middle >= 0 and _truncate_half(upper) > middle:
+                middle = _truncate_half(upper)
+            score = self._negamax(position, mask, moves, middle, middle + 1)
+            if score <= middle:
+                upper = score
+            else:
+                lower = score
+        return lower
+
+    def score(self, board: Union[np.ndarray, Bitboard], player: BoardPiece) -> int:
+        '''the exact score of the position for `player`, who is to move (the game must not be over)'''
+        bitboard = board if isinstance(board, Bitboard) else Bitboard.from_array(board)
+        return self._solve(bitboard.masks[player], bitboard.masks[1] | bitboard.masks[2], bitboard.n_moves)
+
+    def best_move(self, board: Union[np.ndarray, Bitboard], player: BoardPiece) -> Tuple[PlayerAction, int]:
+        '''
+        solves every legal move of `player`
+        :return: the move with the best score (the more central one between equal scores) and its score
+        '''
+        bitboard = board if isinstance(board, Bitboard) else Bitboard.from_array(board)
+        position = bitboard.masks[player]
+        mask = bitboard.masks[1] | bitboard.masks[2]
+        moves = bitboard.n_moves
+        possible = (mask + BOTTOM) & BITBOARD_FULL
+        wins = _winning_cells(position, mask) & possible
+
+        best_action: Optional[int] = None
+        best_score = -CELLS
+        for col in SEARCH_ORDER:
+            move = possible & COLUMN_MASKS[col]
+            if not move:
+                continue
+            if move & wins:
+                return PlayerAction(col), (CELLS + 1 - moves) // 2
+            child_mask = mask | move
+            if child_mask & BITBOARD_FULL == BITBOARD_FULL:
+                score = 0 #the last piece, a draw
+            else:
+                score = -self._solve(position ^ mask, child_mask, moves + 1)
+            if best_action is None or score > best_score:
+                best_action, best_score = col, score
+        return PlayerAction(best_action), best_score
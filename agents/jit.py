@@ -0,0 +1,201 @@
+import os
+import numpy as np
+
+# compiled kernels of the game primitives. When numba is installed, agents.common, agents.windows and the agents
+# use them instead of their Python functions, selected once at import time. Set the environment variable
+# AGENTS_DISABLE_JIT=1 (or numba's own NUMBA_DISABLE_JIT=1) before the import to keep the Python functions.
+# The kernels are compiled by warm_up when this module is imported, so the first move does not pay for it
+# (cache=True keeps the compiled code on disk for the next start).
+# The kernels do not import anything from agents, so that agents.common can import them.
+
+DISABLE_JIT_ENV = 'AGENTS_DISABLE_JIT'
+
+try:
+    if os.environ.get(DISABLE_JIT_ENV, '0') not in ('', '0'):
+        raise ImportError(f"disabled by {DISABLE_JIT_ENV}")
+    from numba import njit
+    JIT_ENABLED = os.environ.get('NUMBA_DISABLE_JIT', '0') in ('', '0')
+except ImportError:
+    JIT_ENABLED = False
+
+    def njit(*args, **kwargs):
+        '''stand-in for numba.njit without numba: returns the function unchanged'''
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda function: function
+
+
+DIRECTIONS = np.array([[0, 1], [1, 0], [1, 1], [1, -1]], dtype=np.int64) #(row, column) steps of the four line directions
+
+
+@njit(cache=True)
+def place_piece_kernel(board: np.ndarray, action: int, player: int) -> int:
+    '''places a piece in column `action` (in place), returns its row or -1 if the column is full or does not exist'''
+    rows, cols = board.shape
+    if action < 0 or action >= cols:
+        return -1
+    for row in range(rows):
+        if board[row, action] == 0:
+            board[row, action] = player
+            return row
+    return -1
+
+
+@njit(cache=True)
+def connected_four_at_kernel(board: np.ndarray, player: int, row: int, col: int, connect_n: int) -> bool:
+    '''True if the piece of `player` at board[row, col] is part of `connect_n` adjacent pieces'''
+    if board[row, col] != player:
+        return False
+    rows, cols = board.shape
+    for direction in range(DIRECTIONS.shape[0]):
+        d_row, d_col = DIRECTIONS[direction, 0], DIRECTIONS[direction, 1]
+        count = 1
+        r, c = row + d_row, col + d_col
+        while count < connect_n and 0 <= r < rows and 0 <= c < cols and board[r, c] == player:
+            count += 1
+            r, c = r + d_row, c + d_col
+        r, c = row - d_row, col - d_col
+        while count < connect_n and 0 <= r < rows and 0 <= c < cols and board[r, c] == player:
+            count += 1
+            r, c = r - d_row, c - d_col
+        if count >= connect_n:
+            return True
+    return False
+
+
+@njit(cache=True)
+def connected_four_kernel(board: np.ndarray, player: int, col: int, connect_n: int) -> bool:
+    '''
+    True if `player` has `connect_n` adjacent pieces: through the top piece of column `col`,
+    or anywhere on the board if col is -1
+    '''
+    rows, cols = board.shape
+    if col >= 0:
+        row = rows - 1
+        while row >= 0 and board[row, col] == 0:
+            row -= 1
+        return row >= 0 and connected_four_at_kernel(board, player, row, col, connect_n)
+    for row in range(rows):
+        for c in range(cols):
+            if board[row, c] == player and connected_four_at_kernel(board, player, row, c, connect_n):
+                return True
+    return False
+
+
+@njit(cache=True)
+def legal_actions_kernel(board: np.ndarray) -> np.ndarray:
+    '''the columns whose top cell is empty'''
+    top = board.shape[0] - 1
+    actions = np.empty(board.shape[1], dtype=np.int64)
+    n = 0
+    for col in range(board.shape[1]):
+        if board[top, col] == 0:
+            actions[n] = col
+            n += 1
+    return actions[:n]
+
+
+@njit(cache=True)
+def connected_n_kernel(board: np.ndarray, player: int, windows: np.ndarray) -> bool:
+    '''True if any window (flat board indices, one window per row) is filled with pieces of `player`'''
+    cols = board.shape[1]
+    for window in range(windows.shape[0]):
+        filled = True
+        for k in range(windows.shape[1]):
+            cell = windows[window, k]
+            if board[cell // cols, cell % cols] != player:
+                filled = False
+                break
+        if filled:
+            return True
+    return False
+
+
+@njit(cache=True)
+def position_value_kernel(board: np.ndarray, windows: np.ndarray, piece_weights: np.ndarray, window_scores: np.ndarray,
+                          center_weights: np.ndarray) -> int:
+    '''
+    the heuristic value of the board: the score of the code (sum of the piece weights) of every window
+    plus the weights of the pieces in the center column
+    '''
+    rows, cols = board.shape
+    value = 0
+    for window in range(windows.shape[0]):
+        code = 0
+        for k in range(windows.shape[1]):
+            cell = windows[window, k]
+            code += piece_weights[board[cell // cols, cell % cols]]
+        value += window_scores[code]
+    for row in range(rows):
+        value += center_weights[board[row, cols // 2]]
+    return value
+
+
+@njit(cache=True, nogil=True)
+def rollout_kernel(mover: int, waiting: int, heights: np.ndarray, player: int, rand: np.ndarray, rows: int,
+                   height_bits: int, run_shifts: np.ndarray) -> int:
+    '''
+    random playout on a bitboard (see agents.agent_MCTS.rollout.rollout), runs without the GIL when compiled
+    :param mover: bit mask of the player to move, `player`
+    :param waiting: bit mask of the other player
+    :param heights: pieces per column, changed in place
+    :param rand: one random number in [0, 1) per move that can still be played
+    :param rows: number of rows, height_bits: bits per column of the masks
+    :param run_shifts: shift amounts that reduce a mask to its runs of four, one row per direction
+    :return: the winner, 0 for a draw
+    '''
+    cols = heights.shape[0]
+    for move in range(rand.shape[0]):
+        n_free = 0
+        for col in range(cols):
+            if heights[col] < rows:
+                n_free += 1
+        if n_free == 0:
+            return 0
+        k = int(rand[move] * n_free)
+        col = 0
+        while heights[col] >= rows or k > 0: #the k-th column that is not full
+            if heights[col] < rows:
+                k -= 1
+            col += 1
+        mover |= 1 << (col * height_bits + heights[col])
+        heights[col] += 1
+        for direction in range(run_shifts.shape[0]):
+            m = mover
+            for step in range(run_shifts.shape[1]):
+                m &= m >> run_shifts[direction, step]
+            if m != 0:
+                return player
+        mover, waiting = waiting, mover
+        player = 3 - player
+    return 0
+
+
+@njit(cache=True, nogil=True)
+def rollouts_kernel(mover: int, waiting: int, heights: np.ndarray, player: int, rand: np.ndarray, rows: int,
+                    height_bits: int, run_shifts: np.ndarray) -> np.ndarray:
+    '''rollout_kernel for every row of random numbers in `rand`, returns the winner of every playout'''
+    winners = np.zeros(rand.shape[0], dtype=np.int64)
+    for game in range(rand.shape[0]):
+        winners[game] = rollout_kernel(mover, waiting, heights.copy(), player, rand[game], rows, height_bits, run_shifts)
+    return winners
+
+
+def warm_up():
+    '''compiles all kernels for the argument types the agents call them with'''
+    board = np.zeros((6, 7), dtype=np.int8)
+    windows = np.zeros((1, 4), dtype=np.int64)
+    weights = np.zeros(3, dtype=np.int64)
+    place_piece_kernel(board, 0, 1)
+    connected_four_at_kernel(board, 1, 0, 0, 4)
+    connected_four_kernel(board, 1, 0, 4)
+    legal_actions_kernel(board)
+    connected_n_kernel(board, 1, windows)
+    position_value_kernel(board, windows, weights, np.zeros(21, dtype=np.int64), weights)
+    shifts = np.ones((4, 2), dtype=np.int64)
+    rollout_kernel(0, 0, np.zeros(7, dtype=np.int64), 1, np.zeros(1), 6, 7, shifts)
+    rollouts_kernel(0, 0, np.zeros(7, dtype=np.int64), 1, np.zeros((1, 1)), 6, 7, shifts)
+
+
+if JIT_ENABLED:
+    warm_up()
@@ -0,0 +1,84 @@
+import json
+import time
+from typing import Optional, Callable, Union, IO
+
+from agents.common import PlayerAction, BoardPiece, SavedState
+
+# every agent takes a `metrics` argument: a callable that receives the SearchStats of each move the agent makes,
+# e.g. a MetricsRecorder that keeps them and streams them to a file as JSON lines. The stats of the last move are
+# also stored as `stats` on the saved state the agent returns (when it returns one).
+
+
+class SearchStats:
+    '''
+    what the search of one move did
+    agent: name of the agent ('random', 'minimax', 'mcts')
+    player: the player who moved
+    action: the chosen column
+    wall_time: seconds from the call of the agent until it returned
+    nodes: positions searched: alpha-beta and endgame solver nodes, or MCTS iterations
+    rollouts: random playouts simulated (MCTS)
+    tree_size: nodes of the MCTS tree after the search
+    tt_hit_rate: share of transposition table probes that found their position in this move, None without a table
+    depth: depth of the deepest completed alpha-beta iteration, the number of empty cells solved by the endgame
+    solver, or the depth of the MCTS tree
+    '''
+
+    def __init__(self, agent: str, player: BoardPiece, action: PlayerAction, wall_time: float, nodes: int = 0,
+                 rollouts: int = 0, tree_size: int = 0, tt_hit_rate: Optional[float] = None, depth: int = 0):
+        self.agent = agent
+        self.player = int(player)
+        self.action = int(action)
+        self.wall_time = wall_time
+        self.nodes = int(nodes)
+        self.rollouts = int(rollouts)
+        self.tree_size = int(tree_size)
+        self.tt_hit_rate = tt_hit_rate
+        self.depth = int(depth)
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.wall_time if self.wall_time > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {'agent': self.agent, 'player': self.player, 'action': self.action, 'wall_time': self.wall_time,
+                'nodes': self.nodes, 'rollouts': self.rollouts, 'tree_size': self.tree_size,
+                'tt_hit_rate': self.tt_hit_rate, 'depth': self.depth, 'nodes_per_second': self.nodes_per_second}
+
+    def __repr__(self) -> str:
+        return f"SearchStats({', '.join(f'{key}={value!r}' for key, value in self.to_dict().items())})"
+
+
+MetricsHook = Callable[[SearchStats], None]
+
+
+def report(stats: SearchStats, saved_state: Optional[SavedState], metrics: Optional[MetricsHook]) -> Optional[SavedState]:
+    '''stores `stats` on the saved state of the agent and passes them to the metrics hook, returns the saved state'''
+    if saved_state is not None:
+        saved_state.stats = stats
+    if metrics is not None:
+        metrics(stats)
+    return saved_state
+
+
+class MetricsRecorder:
+    '''
+    metrics hook that keeps the SearchStats of every move in `records`
+    stream: file name or open text file every record is written to as one JSON line (with a unix timestamp),
+    a file name is opened for appending
+    '''
+
+    def __init__(self, stream: Union[str, IO, None] = None):
+        self.records = []
+        self.stream = open(stream, 'a') if isinstance(stream, str) else stream
+        self._owns_stream = isinstance(stream, str)
+
+    def __call__(self, stats: SearchStats):
+        self.records.append(stats)
+        if self.stream is not None:
+            self.stream.write(json.dumps({'time': time.time(), **stats.to_dict()}) + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self._owns_stream:
+            self.stream.close()
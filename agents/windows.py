@@ -0,0 +1,63 @@
+import numpy as np
+from functools import lru_cache
+
+from agents.common import BoardPiece, CONNECT_N, BOARD_ROWS, BOARD_COLS
+from agents.jit import JIT_ENABLED, connected_n_kernel
+
+
+@lru_cache(maxsize=None)
+def window_table(rows: int, cols: int) -> np.ndarray:
+    '''
+    returns the flat board indices of all windows of CONNECT_N cells in a line (rows, columns, both diagonals),
+    one window per row of the returned (n_windows, CONNECT_N) array - 69 windows on the 6x7 board
+    '''
+    index = np.arange(rows * cols).reshape(rows, cols)
+    windows = []
+    for i in range(rows):
+        for j in range(cols - CONNECT_N + 1):
+            windows.append(index[i, j:j + CONNECT_N]) #rows
+    for i in range(rows - CONNECT_N + 1):
+        for j in range(cols):
+            windows.append(index[i:i + CONNECT_N, j]) #columns
+    for i in range(rows - CONNECT_N + 1):
+        for j in range(cols - CONNECT_N + 1):
+            block = index[i:i + CONNECT_N, j:j + CONNECT_N]
+            windows.append(np.diag(block))
+            windows.append(np.diag(block[::-1, :]))
+    windows = np.array(windows).reshape(-1, CONNECT_N)
+    windows.setflags(write=False) #shared by all callers
+    return windows
+
+
+WINDOWS = window_table(BOARD_ROWS, BOARD_COLS)
+CELL_WINDOWS = [np.flatnonzero((WINDOWS == cell).any(axis=1)).tolist() for cell in range(BOARD_ROWS * BOARD_COLS)] #windows through every cell
+
+
+def board_windows(board: np.ndarray) -> np.ndarray:
+    '''returns the window table matching the shape of the board'''
+    rows, cols = board.shape[-2:]
+    return WINDOWS if (rows, cols) == (BOARD_ROWS, BOARD_COLS) else window_table(rows, cols)
+
+
+def window_counts(board: np.ndarray, player: BoardPiece) -> np.ndarray:
+    '''returns the number of pieces of `player` in every window of the board'''
+    return (board.reshape(-1) == player)[board_windows(board)].sum(axis=1)
+
+
+def connected_n(board: np.ndarray, player: BoardPiece) -> bool:
+    '''
+    Returns True if any window of the board is filled with pieces of `player`, i.e. the player
+    has CONNECT_N adjacent pieces in a horizontal, vertical or diagonal line.
+    Replaces the convolution of the board with one kernel per direction.
+    '''
+    return bool((board.reshape(-1) == player)[board_windows(board)].all(axis=1).any())
+
+
+def _connected_n_jit(board: np.ndarray, player: BoardPiece) -> bool:
+    windows = WINDOWS_JIT if board.shape == (BOARD_ROWS, BOARD_COLS) else np.array(board_windows(board), dtype=np.int64)
+    return connected_n_kernel(board, int(player), windows)
+
+
+WINDOWS_JIT = np.array(WINDOWS, dtype=np.int64) #writable copy, numba compiles read-only arrays separately
+if JIT_ENABLED:
+    connected_n = _connected_n_jit
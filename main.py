@@ -2,14 +2,14 @@
 
 import numpy as np
 from typing import Optional, Callable
-from agents.common import PlayerAction, BoardPiece, SavedState, GenMove
+from agents.common import PlayerAction, BoardPiece, SavedState, GenMove, IllegalMoveError, NO_PLAYER
 #from agents.agent_random import generate_move
 #from agents.agent_minimax import generate_move
 from agents.agent_MCTS import generate_move
 
 def user_move(board: np.ndarray, _player: BoardPiece, saved_state: Optional[SavedState]):
     action = PlayerAction(-1)
-    while not 0 <= action < board.shape[1]:
+    while not 0 <= action < board.shape[1] or board[-1, action] != NO_PLAYER: #ask again for full columns
         try:
             action = PlayerAction(input("Column? "))
         except:
@@ -56,7 +56,13 @@ def human_vs_agent(
                     board.copy(), player, saved_state[player], *args
                 )
                 print(f"Move time: {time.time() - t0:.3f}s")
-                apply_player_action(board, action, player)
+                try:
+                    apply_player_action(board, action, player)
+                except IllegalMoveError as error:
+                    print(pretty_print_board(board))
+                    print(f"{player_name} lost by an illegal move: {error}") #as in agents.arena.play_game
+                    playing = False
+                    break
                 end_state = check_end_state(board, player,action)
                 if end_state != GameState.STILL_PLAYING:
                     print(pretty_print_board(board))
@@ -0,0 +1,423 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+import numpy as np
+from typing import Callable, Optional, Tuple, Union
+
+from agents.common import BoardPiece, PLAYER1, PLAYER2, Bitboard, initialize_game_state, apply_player_action
+from agents.common import connected_four, check_end_state
+
+# benchmark suite of the game primitives and the agents, replacing the old tests/speed.py script.
+# Every benchmark runs on the curated positions in POSITIONS and reports seconds per call (best and median of
+# several repeats). Benchmarks that simulate a known number of games also report them per second ('per_second'),
+# the memory benchmarks report bytes per tree node instead of seconds ('unit'). The measurements of speed.py are
+# parameterised entries of BENCHMARKS:
+#   rollout_ndarray, rollout, rollout_nogil, batch_rollouts_N   one random playout on the numpy board (the original
+#                                                            simulation loop) against the bitboard rollout engines
+#   mcts_workers_N      root parallel MCTS in N processes (500 iterations each), the process pool is started once
+#   mcts_threads_N      tree parallel MCTS in N threads (200 iterations of 8 rollouts on one tree)
+#   node_bytes, pool_bytes   memory per node of the tree in Node objects and in a NodePool
+#   endgame_solver_N_empty   the endgame solver on a position with N empty cells
+#   alphabeta_workers_N      depth 6 alpha-beta with the root moves searched in N processes (without a
+#                            transposition table, so that every call searches the same tree)
+#   <kernel>_python          the benchmarks of the numba kernels run in a subprocess with AGENTS_DISABLE_JIT=1
+# The scaling over MCTS workers and threads is the ratio of the per_second figures of their rows, the alpha-beta
+# speedup the ratio of the best times (both depend on the cpus of the environment). Run from the repository root:
+#   python -m tests.benchmarks                               print a table
+#   python -m tests.benchmarks --output results.json         also write the results as JSON
+#   python -m tests.benchmarks --compare tests/benchmark_baseline.json
+#                                                            exit with status 1 if a benchmark got slower than
+#                                                            --max-slowdown times its baseline
+#   python -m tests.benchmarks --save tests/benchmark_baseline.json   record a new baseline
+# Baselines depend on the machine (and on whether numba is installed), record one before comparing elsewhere.
+# The file has no test_ prefix, so pytest does not collect it.
+
+# move sequences (columns played alternately, PLAYER1 first) without a win and without an immediate win for either
+# player; the player to move next is searched
+POSITIONS = {
+    'opening': '3324',
+    'midgame': '14666020363353',
+    'endgame': '562241231011156142063440040602', #12 empty cells
+    'empty_8': '5630611023533626546500061531032212',
+    'empty_10': '34415433054344635622052635566600',
+    'empty_14': '1541236211223246136214466600',
+    'empty_16': '12330335332000614625401051',
+    'empty_18': '124053516655304406520663',
+}
+# positions of the general benchmarks
+MAIN_POSITIONS = ('opening', 'midgame', 'endgame')
+# position with the given number of empty cells for the endgame solver
+EMPTY_POSITIONS = {8: 'empty_8', 10: 'empty_10', 12: 'endgame', 14: 'empty_14', 16: 'empty_16', 18: 'empty_18'}
+
+
+def position(moves: str) -> Tuple[np.ndarray, BoardPiece]:
+    '''returns the board after the `moves` and the player to move'''
+    board = initialize_game_state()
+    player = PLAYER1
+    for move in moves:
+        apply_player_action(board, int(move), player)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+    return board, player
+
+
+class Timed:
+    '''
+    a timed callable with what it does per call
+    work: number of simulated games (or searched nodes) per call, reported per second, None if not counted
+    close: called once the benchmark is done, e.g. to shut a process pool down
+    '''
+
+    def __init__(self, function: Callable, work: Optional[int] = None, close: Optional[Callable] = None):
+        self.function = function
+        self.work = work
+        self.close = close
+
+
+class Footprint:
+    '''a memory benchmark: `function` returns the bytes per node of a tree it builds'''
+
+    def __init__(self, function: Callable):
+        self.function = function
+
+
+def seeded(function: Callable) -> Callable:
+    '''seeds the random generators before every call, so the agents search the same tree every time'''
+    def call():
+        random.seed(0)
+        np.random.seed(0)
+        return function()
+    return call
+
+
+def bench_apply_player_action(board, player):
+    action = Bitboard.from_array(board).legal_actions()[0]
+    return lambda: apply_player_action(board, action, player, copy=True)
+
+
+def bench_connected_four(board, player):
+    return lambda: connected_four(board, player)
+
+
+def bench_connected_four_last_action(board, player):
+    action = int(np.flatnonzero(board[0])[0])
+    return lambda: connected_four(board, player, action)
+
+
+def bench_check_end_state(board, player):
+    return lambda: check_end_state(board, player)
+
+
+def bench_check_result(board, player):
+    from agents.agent_MCTS.MCTS import check_result
+    return lambda: check_result(board, player)
+
+
+def bench_check_terminal(board, player):
+    from agents.agent_minimax.minimax import check_terminal
+    return lambda: check_terminal(board)
+
+
+def bench_position_value(board, player):
+    from agents.agent_minimax.minimax import position_value
+    return lambda: position_value(board, player)
+
+
+def rollout_ndarray(board: np.ndarray, player: BoardPiece) -> float:
+    '''the original MCTS simulation: a random game on the numpy board, checking the result after every move'''
+    from agents.agent_MCTS.MCTS import get_player_actions, check_result
+    state = board.copy()
+    player_roll = 3 - player
+    action = None
+    result = 0
+    while get_player_actions(state, 3 - player_roll, action) and result != 1 and result != -0.1:
+        player_roll = 3 - player_roll
+        action = random.choice(get_player_actions(state, player_roll, action))
+        apply_player_action(state, action, player_roll)
+        result = check_result(state, player, action)
+    return result
+
+
+def bench_rollout_ndarray(board, player):
+    return Timed(seeded(lambda: rollout_ndarray(board, player)), work=1)
+
+
+def bench_rollout(board, player):
+    from agents.agent_MCTS.rollout import rollout
+    bitboard = Bitboard.from_array(board)
+    return Timed(seeded(lambda: rollout(bitboard, player)), work=1)
+
+
+def bench_rollout_nogil(board, player):
+    from agents.agent_MCTS.rollout import rollout_nogil
+    bitboard = Bitboard.from_array(board)
+    rng = np.random.default_rng(0)
+    return Timed(lambda: rollout_nogil(bitboard, player, rng), work=1)
+
+
+def bench_batch_rollouts(n: int) -> Callable:
+    def bench(board, player):
+        from agents.agent_MCTS.rollout import batch_rollouts
+        bitboard = Bitboard.from_array(board)
+        rng = np.random.default_rng(0)
+        return Timed(lambda: batch_rollouts(bitboard, player, n, rng), work=n)
+    return bench
+
+
+def bench_alphabeta(depth: int) -> Callable:
+    def bench(board, player):
+        from agents.agent_minimax.minimax import generate_smart_move
+        return lambda: generate_smart_move(board, player, None, depth=depth, endgame_empty=0)
+    return bench
+
+
+def bench_alphabeta_workers(workers: int, depth: int = 6) -> Callable:
+    def bench(board, player):
+        from agents.agent_minimax.minimax import generate_smart_move, MinimaxState
+        state = MinimaxState(tt_size=0) #keeps the process pool between the calls, no table carries over
+        if workers > 1:
+            state.executor(workers)
+        return Timed(lambda: generate_smart_move(board, player, state, depth=depth, tt_size=0, workers=workers,
+                                                 endgame_empty=0), close=state.close)
+    return bench
+
+
+def bench_mcts(iterations: int) -> Callable:
+    def bench(board, player):
+        from agents.agent_MCTS.MCTS import monte_carlo_tree_search
+        from agents.agent_MCTS.budget import SearchBudget
+        return Timed(seeded(lambda: monte_carlo_tree_search(board, player, None, SearchBudget(iterations=iterations),
+                                                            endgame_empty=0)), work=iterations)
+    return bench
+
+
+def bench_mcts_workers(workers: int, iterations: int = 500) -> Callable:
+    def bench(board, player):
+        from agents.agent_MCTS.MCTS import monte_carlo_tree_search, MCTSState, Node
+        from agents.agent_MCTS.budget import SearchBudget
+        state = MCTSState(Node(board=board, player=3 - player), board) #keeps the process pool between the calls
+        if workers > 1:
+            state.executor(workers)
+        return Timed(lambda: monte_carlo_tree_search(board, player, state, SearchBudget(iterations=iterations),
+                                                     workers=workers, endgame_empty=0, seed=0),
+                     work=iterations * workers, close=state.close)
+    return bench
+
+
+def bench_mcts_threads(threads: int, iterations: int = 200, rollouts: int = 8) -> Callable:
+    def bench(board, player):
+        from agents.agent_MCTS.MCTS import grow_tree_parallel, Node
+        from agents.agent_MCTS.budget import SearchBudget
+        return Timed(lambda: grow_tree_parallel(Node(board=board, player=3 - player), board, player,
+                                                SearchBudget(iterations=iterations), threads=threads,
+                                                rollouts=rollouts, seed=0), work=iterations * rollouts)
+    return bench
+
+
+def bench_node_bytes(board, player):
+    from agents.agent_MCTS.MCTS import grow_tree, tree_shape, Node
+    from agents.agent_MCTS.budget import SearchBudget
+    def footprint():
+        random.seed(0)
+        tracemalloc.start()
+        root = grow_tree(Node(board=board, player=3 - player), Bitboard.from_array(board), player,
+                         SearchBudget(iterations=2000))
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return size / tree_shape(root)[0]
+    return Footprint(footprint)
+
+
+def bench_pool_bytes(board, player, capacity: int = 2**16):
+    from agents.agent_MCTS.pool import NodePool
+    def footprint():
+        tracemalloc.start()
+        pool = NodePool(board, 3 - player, capacity)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return size / pool.capacity
+    return Footprint(footprint)
+
+
+def bench_endgame_solver(board, player):
+    from agents.endgame import EndgameSolver
+    return lambda: EndgameSolver(max_empty=board.size, table_size=2**16).best_move(board, player)
+
+
+# name: (setup returning the timed callable, a Timed or a Footprint, positions it runs on)
+BENCHMARKS = {
+    'apply_player_action': (bench_apply_player_action, MAIN_POSITIONS),
+    'connected_four': (bench_connected_four, MAIN_POSITIONS),
+    'connected_four_last_action': (bench_connected_four_last_action, MAIN_POSITIONS),
+    'check_end_state': (bench_check_end_state, MAIN_POSITIONS),
+    'check_result': (bench_check_result, MAIN_POSITIONS),
+    'check_terminal': (bench_check_terminal, MAIN_POSITIONS),
+    'position_value': (bench_position_value, MAIN_POSITIONS),
+    'rollout_ndarray': (bench_rollout_ndarray, MAIN_POSITIONS),
+    'rollout': (bench_rollout, MAIN_POSITIONS),
+    'rollout_nogil': (bench_rollout_nogil, MAIN_POSITIONS),
+    **{f'batch_rollouts_{n}': (bench_batch_rollouts(n), ('opening',)) for n in (16, 256, 4096)},
+    'alphabeta_depth2': (bench_alphabeta(2), MAIN_POSITIONS),
+    'alphabeta_depth4': (bench_alphabeta(4), MAIN_POSITIONS),
+    **{f'alphabeta_workers_{n}': (bench_alphabeta_workers(n), ('opening',)) for n in (1, 2, 4)},
+    'mcts_200_iterations': (bench_mcts(200), MAIN_POSITIONS),
+    'mcts_1000_iterations': (bench_mcts(1000), ('opening', 'midgame')),
+    **{f'mcts_workers_{n}': (bench_mcts_workers(n), ('opening',)) for n in (1, 2, 4)},
+    **{f'mcts_threads_{n}': (bench_mcts_threads(n), ('opening',)) for n in (1, 2, 4)},
+    'node_bytes': (bench_node_bytes, ('opening',)),
+    'pool_bytes': (bench_pool_bytes, ('opening',)),
+    **{f'endgame_solver_{n}_empty': (bench_endgame_solver, (name,)) for n, name in EMPTY_POSITIONS.items()},
+}
+
+# benchmarks of the functions agents.jit swaps for numba kernels, also run as `<name>_python` without them
+JIT_BENCHMARKS = ('apply_player_action', 'connected_four', 'connected_four_last_action', 'check_end_state',
+                  'check_result', 'check_terminal', 'position_value', 'rollout_nogil')
+PYTHON_SUFFIX = '_python'
+
+
+def benchmark_names() -> list:
+    '''names of all benchmarks, including the `<name>_python` rows'''
+    return list(BENCHMARKS) + [name + PYTHON_SUFFIX for name in JIT_BENCHMARKS]
+
+
+def measure(timed: Union[Callable, Timed], repeat: int = 5, min_time: float = 0.2) -> dict:
+    '''
+    times the callable in `repeat` runs of as many calls as take at least `min_time` seconds
+    :return: seconds per call of the fastest and the median run and the number of calls per run,
+    with the work of a Timed also its work per second in the fastest run
+    '''
+    if not isinstance(timed, Timed):
+        timed = Timed(timed)
+    timed.function() #warm up caches (and compile numba kernels)
+    timer = timeit.Timer(timed.function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    runs = [seconds / number for seconds in timer.repeat(repeat, number)]
+    result = {'best': min(runs), 'median': float(np.median(runs)), 'number': number, 'unit': 's'}
+    if timed.work is not None:
+        result['per_second'] = timed.work / result['best']
+    if timed.close is not None:
+        timed.close()
+    return result
+
+
+def measure_footprint(footprint: Footprint, repeat: int = 5) -> dict:
+    '''bytes per node of the smallest and the median of `repeat` trees'''
+    sizes = [footprint.function() for _ in range(repeat)]
+    return {'best': min(sizes), 'median': float(np.median(sizes)), 'number': 1, 'unit': 'bytes/node'}
+
+
+def run_python(names: list, repeat: int = 5, min_time: float = 0.2) -> dict:
+    '''
+    runs the benchmarks `names` in a subprocess with the numba kernels disabled (AGENTS_DISABLE_JIT=1, which has to
+    be set before agents is imported), returns the results keyed by "benchmark_python/position"
+    '''
+    from agents.jit import DISABLE_JIT_ENV
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'results.json')
+        subprocess.run([sys.executable, '-m', 'tests.benchmarks', *names, '--repeat', str(repeat),
+                        '--min-time', str(min_time), '--output', output],
+                       env={**os.environ, DISABLE_JIT_ENV: '1'}, cwd=os.path.dirname(os.path.dirname(__file__)),
+                       stdout=subprocess.DEVNULL, check=True)
+        with open(output) as file:
+            results = json.load(file)['results']
+    renamed = {}
+    for key, result in results.items():
+        name, position_name = key.split('/')
+        renamed[f"{name}{PYTHON_SUFFIX}/{position_name}"] = result
+    return renamed
+
+
+def run(names: Optional[list] = None, repeat: int = 5, min_time: float = 0.2) -> dict:
+    '''runs the benchmarks `names` (all if None), returns the results keyed by "benchmark/position"'''
+    results = {}
+    python = []
+    for name in names or benchmark_names():
+        if name.endswith(PYTHON_SUFFIX) and name not in BENCHMARKS:
+            python.append(name[:-len(PYTHON_SUFFIX)])
+            continue
+        setup, positions = BENCHMARKS[name]
+        for position_name in positions:
+            board, player = position(POSITIONS[position_name])
+            benchmark = setup(board, player)
+            if isinstance(benchmark, Footprint):
+                results[f"{name}/{position_name}"] = measure_footprint(benchmark, repeat)
+            else:
+                results[f"{name}/{position_name}"] = measure(benchmark, repeat, min_time)
+    if python:
+        results.update(run_python(python, repeat, min_time))
+    return results
+
+
+def environment() -> dict:
+    from agents.jit import JIT_ENABLED
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'jit': JIT_ENABLED}
+
+
+def regressions(results: dict, baseline: dict, max_slowdown: float) -> list:
+    '''returns (key, slowdown) of the results more than `max_slowdown` times slower (or larger) than their baseline (best values)'''
+    slower = []
+    for key, result in results.items():
+        if key in baseline:
+            slowdown = result['best'] / baseline[key]['best']
+            if slowdown > max_slowdown:
+                slower.append((key, slowdown))
+    return slower
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of the game primitives and the agents")
+    parser.add_argument('benchmarks', nargs='*', help=f"benchmarks to run, all by default: {', '.join(benchmark_names())}")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds per run of a benchmark")
+    parser.add_argument('--output', help="file the results are written to as JSON")
+    parser.add_argument('--save', help="file the results are written to as a new baseline")
+    parser.add_argument('--compare', help="baseline file to compare the results with")
+    parser.add_argument('--max-slowdown', type=float, default=1.5,
+                        help="a benchmark regresses if its best time (or size) exceeds this multiple of the baseline")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in benchmark_names()]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run(args.benchmarks, args.repeat, args.min_time)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+
+    for key, result in results.items():
+        if result['unit'] == 's':
+            line = f"{key:45} {result['best']*1e6:12.1f} us  (median {result['median']*1e6:.1f} us)"
+        else:
+            line = f"{key:45} {result['best']:12.1f} {result['unit']}"
+        if 'per_second' in result:
+            line += f"  {result['per_second']:.0f}/s"
+        if baseline is not None and key in baseline:
+            line += f"  {result['best'] / baseline[key]['best']:.2f}x baseline"
+        print(line)
+
+    report = {'environment': environment(), 'results': results}
+    for path in (args.output, args.save):
+        if path:
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+
+    if baseline is not None:
+        slower = regressions(results, baseline, args.max_slowdown)
+        for key, slowdown in slower:
+            print(f"REGRESSION {key}: {slowdown:.2f}x slower than the baseline (limit {args.max_slowdown:.2f}x)")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -69,7 +69,6 @@ def test_node_setup():
     node = Node(board = board, player = player_check)
     actions = get_player_actions(board, player_check)
 
-    assert node.board.all() == board.all()
     assert node.parent is None
     assert node.action is None
     assert node.childNodes == []
@@ -97,19 +96,22 @@ def test_selection():
 
 
 def test_expansion():
-    from agents.common import initialize_game_state
+    from agents.common import initialize_game_state, BoardState
     from agents.agent_MCTS.MCTS import Node
 
     player_check = 2
     board = initialize_game_state()
     node = Node(board=board, player=player_check)
     action = 4
-    expanded_node = node.expansion(action=action)
+    state = BoardState(board)
+    expanded_node = node.expansion(action=action, state=state)
 
     assert expanded_node.parent == node
     assert node.childNodes == [expanded_node]
     assert expanded_node.action == action
     assert node.player == 3- expanded_node.player
+    assert board[0, action] == expanded_node.player
+    assert node.action_notExp == [0, 1, 2, 3, 5, 6]
 
 def test_update():
     from agents.common import initialize_game_state
@@ -133,3 +135,348 @@ def test_monte_carlo_tree_search():
     ret = monte_carlo_tree_search(board=board, player=player_check, saved_state=None)
 
     assert isinstance(ret[0], int)
+
+def test_tree_reuse():
+    from agents.common import initialize_game_state, apply_player_action
+    from agents.agent_MCTS.MCTS import monte_carlo_tree_search, MCTSState
+
+    player_check = 2
+    board = initialize_game_state()
+    action1, saved_state1 = monte_carlo_tree_search(board=board, player=player_check, saved_state=None, timeout=0.2)
+    apply_player_action(board, action1, player_check)
+
+    assert isinstance(saved_state1, MCTSState)
+    assert saved_state1.root.parent is None
+    assert (saved_state1.board == board).all()
+
+    reply = max(saved_state1.root.childNodes, key=lambda child: child.visits)
+    visits = reply.visits
+    apply_player_action(board, reply.action, 3 - player_check)
+    action2, saved_state2 = monte_carlo_tree_search(board=board, player=player_check, saved_state=saved_state1, timeout=0.2)
+
+    assert visits > 0
+    assert reply.parent is None
+    assert reply.visits > visits  # the statistics of the first search are kept
+    assert saved_state2.root in reply.childNodes
+    assert saved_state2.root.action == action2
+
+    board[board != 0] = 0  # a board that does not follow from the saved one starts a new tree
+    assert saved_state2.advance(board) is None
+
+def test_rollout():
+    import random
+    from agents.common import Bitboard, string_to_board, PLAYER1, PLAYER2, NO_PLAYER
+    from agents.agent_MCTS.rollout import rollout, LEGAL_COLUMNS
+
+    # only column 6 is left, an O at its bottom completes the row of O's
+    last_move = Bitboard.from_array(string_to_board('| - - - - - - - |\n| X O X O X O . |\n| X O X O X O . |\n| O X O X O X . |\n| O X O X O X . |\n| X O X O X O . |\n| X O X O O O . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'))
+    full = Bitboard.from_array(string_to_board('| - - - - - - - |\n| X O X O X O X |\n| X O X O X O X |\n| O X O X O X O |\n| O X O X O X O |\n| X O X O X O X |\n| X O X O X O X |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'))
+    before = last_move.copy()
+    empty = Bitboard()
+
+    assert LEGAL_COLUMNS[0b1000101] == (0, 2, 6)
+    assert rollout(last_move, PLAYER1) == PLAYER1
+    assert last_move == before
+    assert rollout(full, PLAYER1) == NO_PLAYER
+
+    random.seed(0)
+    results = [rollout(empty, PLAYER1) for _ in range(200)]
+
+    assert set(results) <= {NO_PLAYER, PLAYER1, PLAYER2}
+    assert results.count(PLAYER1) > results.count(PLAYER2)  # moving first is an advantage
+    assert empty == Bitboard()
+
+def test_batch_rollouts():
+    from agents.common import Bitboard, string_to_board, PLAYER1, PLAYER2, NO_PLAYER
+    from agents.agent_MCTS.rollout import batch_rollouts
+
+    last_move = Bitboard.from_array(string_to_board('| - - - - - - - |\n| X O X O X O . |\n| X O X O X O . |\n| O X O X O X . |\n| O X O X O X . |\n| X O X O X O . |\n| X O X O O O . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'))
+    full = Bitboard.from_array(string_to_board('| - - - - - - - |\n| X O X O X O X |\n| X O X O X O X |\n| O X O X O X O |\n| O X O X O X O |\n| X O X O X O X |\n| X O X O X O X |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'))
+    rng = np.random.default_rng(0)
+
+    ret1 = batch_rollouts(last_move, PLAYER1, 10, rng)
+    ret2 = batch_rollouts(full, PLAYER1, 10, rng)
+    ret3 = batch_rollouts(Bitboard(), PLAYER1, 2000, rng)
+
+    assert ret1.shape == (10,)
+    assert (ret1 == PLAYER1).all()
+    assert (ret2 == NO_PLAYER).all()
+    assert set(ret3.tolist()) <= {NO_PLAYER, PLAYER1, PLAYER2}
+    assert 0.5 < (ret3 == PLAYER1).mean() < 0.62  # about 55% for the first player with random play
+    assert last_move.heights[6] == 0
+
+def test_monte_carlo_tree_search_batched():
+    from agents.common import initialize_game_state
+    from agents.agent_MCTS.MCTS import monte_carlo_tree_search
+
+    player_check = 2
+    board = initialize_game_state()
+    action, saved_state = monte_carlo_tree_search(board=board, player=player_check, saved_state=None, timeout=0.3, rollouts=64)
+
+    assert 0 <= action < 7
+    assert saved_state.root.visits >= 64
+    assert saved_state.root.visits % 64 == 0  # no terminal positions this early
+
+def test_root_parallel_search():
+    from agents.common import initialize_game_state
+    from agents.agent_MCTS.MCTS import root_parallel_search, monte_carlo_tree_search
+
+    player_check = 2
+    board = initialize_game_state()
+    root = root_parallel_search(board, player_check, timeout=0.3, workers=2)
+
+    assert sorted(child.action for child in root.childNodes) == list(range(7))
+    assert root.visits == sum(child.visits for child in root.childNodes)
+    assert root.action_notExp == []
+    assert all(child.parent is root for child in root.childNodes)
+
+    action, saved_state = monte_carlo_tree_search(board=board, player=player_check, saved_state=None, timeout=0.3, workers=2)
+
+    assert 0 <= action < 7
+    assert saved_state.root.action == action
+
+    # the process pool is kept for the next move
+    executor = saved_state.pool[1]
+    board = saved_state.board.copy()
+    board[0, 6 if action != 6 else 5] = 3 - player_check
+    _, saved_state = monte_carlo_tree_search(board=board, player=player_check, saved_state=saved_state, timeout=0.1, workers=2)
+    assert saved_state.pool[1] is executor
+    saved_state.close()
+    assert saved_state.pool is None
+
+def test_grow_tree_parallel():
+    from agents.common import initialize_game_state
+    from agents.agent_MCTS.MCTS import Node, grow_tree_parallel, monte_carlo_tree_search
+    from agents.agent_MCTS.budget import SearchBudget
+
+    player_check = 2
+    board = initialize_game_state()
+    root = Node(board=board, player=3 - player_check)
+    grow_tree_parallel(root, board, player_check, SearchBudget(iterations=200), threads=3, rollouts=8)
+
+    def check(node):  # no virtual loss is left behind and the visits add up
+        assert node.visits >= sum(child.visits for child in node.childNodes)
+        for child in node.childNodes:
+            check(child)
+
+    assert 200 * 8 <= root.visits <= 202 * 8  # the other threads finish their running iteration
+    assert root.visits % 8 == 0  # no terminal positions this early
+    check(root)
+
+    action, saved_state = monte_carlo_tree_search(board=board, player=player_check, saved_state=None, timeout=0.3, threads=2)
+
+    assert saved_state.root.action == action
+
+def test_node_pool():
+    from agents.common import initialize_game_state, Bitboard, PLAYER1, PLAYER2
+    from agents.agent_MCTS.pool import NodePool, grow_pool
+    from agents.agent_MCTS.budget import SearchBudget
+
+    board = initialize_game_state()
+    pool = NodePool(board, PLAYER2, capacity=1000)
+    grow_pool(pool, Bitboard.from_array(board), PLAYER1, SearchBudget(iterations=1000))
+
+    assert len(pool) <= 1000
+    assert pool.full > 0  # every iteration expands a node, 1000 of them need more than 1000 slots
+    assert pool.visits[0] == pool.visits[list(pool.children(0))].sum()
+    for node in range(1, len(pool)):
+        assert node in pool.children(pool.parent[node])
+        assert pool.player[node] == 3 - pool.player[pool.parent[node]]
+
+    node = int(pool.visits[1:len(pool)].argmax()) + 1
+    while pool.first_child[node] >= 0 and pool.visits[list(pool.children(node))].sum() > 0:
+        node = max(pool.children(node), key=lambda child: pool.visits[child])
+    path = pool.path(node)
+    state = pool.board(node)
+    assert state.n_moves == len(path)
+
+    # the kept subtree keeps its statistics
+    child = pool.child(0, path[0])
+    visits = pool.visits[child]
+    size = len(pool)
+    pool.reroot(child, pool.board(child).to_array())
+    assert pool.visits[0] == visits
+    assert pool.parent[0] == -1
+    assert pool.action[0] == -1
+    assert len(pool) < size
+    for node in range(1, len(pool)):
+        assert node in pool.children(pool.parent[node])
+    assert pool.board(len(pool) - 1).n_moves == 1 + len(pool.path(len(pool) - 1))
+
+def test_monte_carlo_tree_search_pool():
+    from agents.common import initialize_game_state, apply_player_action, PLAYER1
+    from agents.agent_MCTS.MCTS import monte_carlo_tree_search
+    from agents.agent_MCTS.pool import PoolState
+
+    board = initialize_game_state()
+    action1, saved_state1 = monte_carlo_tree_search(board=board, player=PLAYER1, saved_state=None, timeout=0.2, node_cap=2**16)
+
+    assert isinstance(saved_state1, PoolState)
+    board = apply_player_action(board, action1, PLAYER1)
+    assert (saved_state1.board == board).all()
+    assert saved_state1.pool.action[0] == -1
+
+    reply = max(saved_state1.pool.children(0), key=lambda child: saved_state1.pool.visits[child])
+    board = apply_player_action(board, saved_state1.pool.action[reply], 3 - PLAYER1)
+    action2, saved_state2 = monte_carlo_tree_search(board=board, player=PLAYER1, saved_state=saved_state1, timeout=0.2, node_cap=2**16)
+
+    assert board[-1, action2] == 0
+    assert saved_state2.pool is saved_state1.pool  # the pool is reused
+    assert len(saved_state2.pool) <= 2**16
+
+def test_monte_carlo_tree_search_small_pool():
+    import pytest
+    from agents.common import initialize_game_state, apply_player_action, PLAYER1, PLAYER2, BOARD_COLS
+    from agents.agent_MCTS.MCTS import monte_carlo_tree_search
+    from agents.agent_MCTS.budget import SearchBudget
+
+    board = initialize_game_state()
+    for node_cap in (1, 7):  # no room for the children of the root
+        with pytest.raises(ValueError, match="node_cap"):
+            monte_carlo_tree_search(board, PLAYER1, None, SearchBudget(iterations=50), node_cap=node_cap)
+
+    # the smallest pool holds the root and its children, it keeps playing legal moves when it is full
+    saved_state = None
+    for _ in range(4):
+        action, saved_state = monte_carlo_tree_search(board, PLAYER1, saved_state, SearchBudget(iterations=50),
+                                                      node_cap=BOARD_COLS + 1, endgame_empty=0)
+        assert board[-1, action] == 0
+        board = apply_player_action(board, action, PLAYER1)
+        board = apply_player_action(board, int(np.flatnonzero(board[-1] == 0)[0]), PLAYER2)
+
+def test_selection_policies():
+    import numpy as np
+    import pytest
+    from agents.agent_MCTS.policy import SelectionPolicy, UCB1, UCB1Tuned, PUCT, get_policy, move_priors
+
+    with pytest.raises(TypeError):
+        SelectionPolicy()  # abstract, a policy has to define its scores
+
+    wins = np.array([5., 5., 0.5])
+    visits = np.array([10., 10., 4.])
+    squares = np.array([5., 5., 0.5])
+    priors = np.array([1., 1., 1.])
+
+    assert UCB1(tie_break='first').select(wins, visits, squares, priors, 24) == 0
+    assert UCB1(tie_break='last').select(wins, visits, squares, priors, 24) == 1
+    assert UCB1(c=0, tie_break='random').select(wins, visits, squares, priors, 24) in (0, 1, 2)
+    assert UCB1(c=10).select(wins, visits, squares, priors, 24) == 2  # less visited child
+
+    # the exploration term of UCB1-Tuned is at most the one of UCB1 with c/2
+    tuned = UCB1Tuned().scores(wins, visits, squares, priors, 24)
+    assert (tuned <= UCB1(c=0.5).scores(wins, visits, squares, priors, 24) + 1e-12).all()
+
+    # PUCT follows the priors between equal children
+    assert PUCT().select(wins, visits, squares, np.array([1., 3., 1.]), 24) == 1
+
+    heights = [0, 0, 0, 0, 0, 0, 0]
+    priors = move_priors(heights, [0, 3, 6])
+    assert priors[1] > priors[0] == priors[2]
+
+    assert isinstance(get_policy('puct'), PUCT)
+    assert isinstance(get_policy(None), UCB1)
+    with pytest.raises(ValueError):
+        get_policy('ucb2')
+    with pytest.raises(ValueError):
+        UCB1(tie_break='middle')
+
+def test_monte_carlo_tree_search_policies():
+    from agents.common import initialize_game_state
+    from agents.agent_MCTS.MCTS import monte_carlo_tree_search
+    from agents.agent_MCTS.policy import UCB1
+
+    board = initialize_game_state()
+    for policy in ('ucb1-tuned', 'puct', UCB1(c=2, tie_break='random')):
+        action, saved_state = monte_carlo_tree_search(board=board, player=1, saved_state=None, timeout=0.1, policy=policy)
+        assert saved_state.root.action == action
+        action, saved_state = monte_carlo_tree_search(board=board, player=1, saved_state=None, timeout=0.1, policy=policy,
+                                                      node_cap=2**12)
+        assert board[-1, action] == 0
+
+def test_search_budget():
+    import random
+    import time
+    import pytest
+    from agents.common import initialize_game_state, Bitboard, PLAYER1, PLAYER2
+    from agents.agent_MCTS.MCTS import Node, grow_tree, grow_tree_parallel, monte_carlo_tree_search
+    from agents.agent_MCTS.pool import NodePool, grow_pool
+    from agents.agent_MCTS.budget import SearchBudget
+
+    board = initialize_game_state()
+
+    def search(seed):
+        random.seed(seed)
+        root = Node(board=board, player=PLAYER2)
+        grow_tree(root, Bitboard.from_array(board), PLAYER1, SearchBudget(iterations=300))
+        return root
+
+    root1, root2 = search(1), search(1)
+    assert root1.visits == 300
+    assert [(child.action, child.visits, child.wins) for child in root1.childNodes] == \
+           [(child.action, child.visits, child.wins) for child in root2.childNodes]
+
+    root = Node(board=board, player=PLAYER2)
+    grow_tree(root, Bitboard.from_array(board), PLAYER1, SearchBudget(nodes=50))
+    assert root.visits == 50  # every iteration adds one node this early
+
+    pool = NodePool(board, PLAYER2, 2**12)
+    grow_pool(pool, Bitboard.from_array(board), PLAYER1, SearchBudget(iterations=100))
+    assert pool.visits[0] == 100
+
+    budget = SearchBudget(timeout=0.1, check_every=8)
+    start = time.perf_counter()
+    grow_tree(Node(board=board, player=PLAYER2), Bitboard.from_array(board), PLAYER1, budget)
+    assert time.perf_counter() - start >= 0.1
+    assert time.perf_counter() - start < 10  # generous, only catches a search that ignores the deadline
+    assert budget.iteration % 8 == 0  # stopped at a clock check
+
+    root = Node(board=board, player=PLAYER2)
+    grow_tree_parallel(root, board, PLAYER1, SearchBudget(iterations=64), threads=2)
+    assert 64 <= root.visits <= 65  # the other thread finishes its iteration
+
+    action, saved_state = monte_carlo_tree_search(board=board, player=PLAYER1, saved_state=None,
+                                                  timeout=SearchBudget(iterations=64), node_cap=2**10)
+    assert board[-1, action] == 0
+    with pytest.raises(ValueError):
+        SearchBudget()
+
+def test_mcts_solver():
+    from agents.common import initialize_game_state, Bitboard, PLAYER1, PLAYER2
+    from agents.agent_MCTS.MCTS import Node, grow_tree, monte_carlo_tree_search
+    from agents.agent_MCTS.pool import NodePool, grow_pool
+    from agents.agent_MCTS.budget import SearchBudget
+    from agents.agent_MCTS.solver import WIN, LOSS, proven_value
+
+    assert proven_value([None, WIN], complete=False) == LOSS
+    assert proven_value([LOSS, 0, None], complete=True) is None
+    assert proven_value([LOSS, 0, LOSS], complete=True) == 0
+    assert proven_value([LOSS, LOSS], complete=True) == WIN
+
+    # PLAYER1 (O) wins by playing column 1 or 4, which leaves two threats on the bottom row
+    board = initialize_game_state()
+    board[0, 2] = board[0, 3] = PLAYER1
+    board[0, 6] = board[1, 6] = PLAYER2
+
+    root = Node(board=board, player=PLAYER2)
+    grow_tree(root, Bitboard.from_array(board), PLAYER1, SearchBudget(iterations=20000))
+    assert root.proven == LOSS  # for X (PLAYER2), who moved into the root
+    assert root.visits < 20000  # the search stops once the root is proven
+    assert {child.action for child in root.childNodes if child.proven == WIN} <= {1, 4}
+
+    pool = NodePool(board, PLAYER2, 2**14)
+    grow_pool(pool, Bitboard.from_array(board), PLAYER1, SearchBudget(iterations=20000))
+    assert pool.proven[0] == LOSS
+    assert pool.visits[0] < 20000
+
+    for node_cap in (None, 2**14):
+        action, _ = monte_carlo_tree_search(board=board, player=PLAYER1, saved_state=None,
+                                            timeout=SearchBudget(iterations=20000), node_cap=node_cap)
+        assert action in (1, 4)
+
+def test_score_winners():
+    from agents.agent_MCTS.rollout import score_winners
+
+    result, squares = score_winners([1, 1, 2, 0], 1)
+    assert result == pytest.approx(2 - 0.1)
+    assert squares == pytest.approx(2 + 0.01)
+    assert score_winners([], 2) == (0, 0)
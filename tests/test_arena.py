@@ -0,0 +1,79 @@
+import json
+import numpy as np
+
+import pytest
+
+
+def always_first_column(board, player, saved_state):
+    return 0, saved_state
+
+
+def test_play_game():
+    from agents.arena import Contestant, play_game
+
+    record = play_game(Contestant('random', 'a'), Contestant('minimax', 'b', depth=2), seed=0)
+
+    assert record.first == 'a' and record.second == 'b'
+    assert [move[0] for move in record.moves[:4]] == ['a', 'b', 'a', 'b']
+    assert record.winner in ('a', 'b', None)
+    assert not record.illegal
+    assert all(move[2] >= 0 for move in record.moves)
+
+    # the seventh piece in column 0 is illegal, player 1 plays it
+    record = play_game(Contestant(always_first_column, 'a'), Contestant(always_first_column, 'b'))
+    assert record.illegal
+    assert record.winner == 'b'
+    assert len(record.moves) == 7 and record.moves[-1][1] is None
+
+
+def test_elo_difference():
+    from agents.arena import elo_difference
+
+    assert elo_difference(0.5, 10) == 0
+    assert elo_difference(0.75, 100) == pytest.approx(190.8, abs=0.1)
+    assert elo_difference(0.25, 100) == pytest.approx(-elo_difference(0.75, 100))
+    assert np.isfinite(elo_difference(1.0, 10)) and elo_difference(1.0, 10) > elo_difference(0.9, 10)
+
+
+def test_run_arena(tmp_path):
+    from agents.arena import Contestant, run_arena
+
+    log_path = tmp_path / "games.jsonl"
+    report = run_arena(Contestant('random', 'a'), Contestant('random', 'b'), n_games=4, workers=2,
+                       log_path=str(log_path), seed=3)
+
+    assert len(report.games) == 4
+    assert [record.first for record in report.games] == ['a', 'b', 'a', 'b']
+    assert report.wins['a'] + report.wins['b'] + report.draws == 4
+    assert report.to_dict()['contestants']['a']['wins'] == report.wins['a']
+    mean, p95 = report.latency('a')
+    assert 0 <= mean and 0 <= p95
+
+    logs = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [log['game'] for log in logs] == [0, 1, 2, 3]
+    assert logs[1]['moves'][0][0] == 'b'
+
+    # the same seeds play the same games, in one process or several
+    again = run_arena(Contestant('random', 'a'), Contestant('random', 'b'), n_games=4, seed=3)
+    assert [record.moves[i][:2] for record in again.games for i in range(len(record.moves))] == \
+           [record.moves[i][:2] for record in report.games for i in range(len(record.moves))]
+
+    with pytest.raises(ValueError):
+        run_arena(Contestant('random'), Contestant('random'))
+
+
+def test_arena_seeded_mcts():
+    from agents.arena import Contestant, run_arena, elo_difference, ArenaReport
+    from agents.agent_MCTS.budget import SearchBudget
+
+    def games():
+        report = run_arena(Contestant('mcts', 'a', timeout=SearchBudget(iterations=30), rollouts=4, endgame_empty=0),
+                           Contestant('random', 'b'), n_games=2, seed=5)
+        return [[move[:2] for move in record.moves] for record in report.games]
+
+    assert games() == games()  # the batched rollouts draw from a generator seeded by the arena
+
+    assert elo_difference(0.5, 0) == 0
+    assert ArenaReport(('a', 'b'), []).score == 0.5
+    with pytest.raises(ValueError):
+        run_arena(Contestant('random', 'a'), Contestant('random', 'b'), n_games=0)
@@ -0,0 +1,50 @@
+import numpy as np
+
+import pytest
+
+
+def test_benchmark_positions():
+    from tests.benchmarks import POSITIONS, BENCHMARKS, position
+    from agents.common import Bitboard, PLAYER1
+
+    for moves in POSITIONS.values():
+        board, player = position(moves)
+        assert np.count_nonzero(board) == len(moves)
+        assert player == PLAYER1 if len(moves) % 2 == 0 else player != PLAYER1
+        bitboard = Bitboard.from_array(board)
+        for piece in (1, 2):
+            assert not bitboard.is_win(piece)
+            for action in bitboard.legal_actions(): #no immediate win, the agents have to search
+                bitboard.apply(action, piece)
+                assert not bitboard.is_win(piece)
+                bitboard.undo(action)
+    assert all(name in POSITIONS for _, positions in BENCHMARKS.values() for name in positions)
+
+
+def test_benchmark_empty_positions():
+    from tests.benchmarks import POSITIONS, EMPTY_POSITIONS, BENCHMARKS, JIT_BENCHMARKS, PYTHON_SUFFIX, benchmark_names
+
+    for empty, name in EMPTY_POSITIONS.items():
+        assert 42 - len(POSITIONS[name]) == empty
+        assert BENCHMARKS[f'endgame_solver_{empty}_empty'][1] == (name,)
+    assert all(name in BENCHMARKS for name in JIT_BENCHMARKS)
+    assert all(name + PYTHON_SUFFIX in benchmark_names() for name in JIT_BENCHMARKS)
+
+
+def test_benchmark_regressions():
+    from tests.benchmarks import measure, measure_footprint, regressions, Timed, Footprint
+
+    result = measure(lambda: sum(range(100)), repeat=2, min_time=0.01)
+    assert 0 < result['best'] <= result['median'] and result['number'] >= 1
+    assert result['unit'] == 's' and 'per_second' not in result
+
+    closed = []
+    result = measure(Timed(lambda: sum(range(100)), work=100, close=lambda: closed.append(True)), repeat=2, min_time=0.01)
+    assert result['per_second'] == pytest.approx(100 / result['best']) and closed == [True]
+
+    result = measure_footprint(Footprint(lambda: 48.0), repeat=2)
+    assert result['best'] == result['median'] == 48.0 and result['unit'] == 'bytes/node'
+
+    baseline = {'a/opening': {'best': 1.0}, 'b/opening': {'best': 1.0}}
+    results = {'a/opening': {'best': 1.2}, 'b/opening': {'best': 2.0}, 'c/opening': {'best': 5.0}}
+    assert regressions(results, baseline, 1.5) == [('b/opening', 2.0)]
@@ -31,7 +31,7 @@ def test_pretty_print_board():
 
 
 def test_apply_player_action():
-    from agents.common import apply_player_action
+    from agents.common import apply_player_action, IllegalMoveError
     from agents.common import string_to_board
 
 
@@ -52,7 +52,8 @@ def test_apply_player_action():
     check_board2[2,4] = 2
 
     ret= apply_player_action(board1, player_action1, player_check)
-    ret2 = apply_player_action(board2, player_action1, player_check)
+    with pytest.raises(IllegalMoveError):
+        apply_player_action(board2, player_action1, player_check)
     ret3 = apply_player_action(board3, player_action1, player_check)
 
 
@@ -60,7 +61,6 @@ def test_apply_player_action():
     assert ret.dtype == np.int8
     assert ret.shape == (6, 7)
     assert (ret == check_board).all()
-    assert ret2 == IndexError
     assert (ret3 == check_board2).all()
 
 
@@ -125,3 +125,119 @@ def test_connected_four():
 
 
 
+def test_bitboard_conversion():
+    from agents.common import Bitboard, string_to_board, pretty_print_board
+
+    pp_board = '| - - - - - - - |\n| . . X O . . . |\n| . X O X . . . |\n| . X O O . . . |\n| . O X O O . . |\n| . X O X O . . |\n| . X X O O X . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'
+    board = string_to_board(pp_board)
+
+    bitboard = Bitboard.from_array(board)
+    ret = bitboard.to_array()
+
+    assert ret.dtype == np.int8
+    assert (ret == board).all()
+    assert str(bitboard) == pretty_print_board(board)
+    assert Bitboard.from_string(pp_board) == bitboard
+    assert bitboard.heights == [0, 5, 6, 6, 3, 1, 0]
+    assert bitboard.n_moves == 21
+    assert bitboard.legal_actions() == [0, 1, 4, 5, 6]
+
+
+def test_bitboard_apply_undo():
+    from agents.common import Bitboard, IllegalMoveError, PLAYER1, PLAYER2, apply_player_action, initialize_game_state
+
+    bitboard = Bitboard()
+    board = initialize_game_state()
+    for action, player in ((3, PLAYER1), (3, PLAYER2), (4, PLAYER1)):
+        bitboard.apply(action, player)
+        apply_player_action(board, action, player)
+    before = bitboard.copy()
+
+    bitboard.apply(0, PLAYER2)
+    bitboard.undo(0)
+
+    assert bitboard == before
+    assert (bitboard.to_array() == board).all()
+    for _ in range(6):
+        bitboard.apply(6, PLAYER1)
+    with pytest.raises(IllegalMoveError):
+        bitboard.apply(6, PLAYER2)
+    assert 6 not in bitboard.legal_actions()
+
+
+def test_bitboard_win_and_draw():
+    from agents.common import Bitboard, GameState, string_to_board, PLAYER1, PLAYER2
+
+    row = Bitboard.from_array(string_to_board('| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . X . . . |\n| . O O O O . . |\n| . X X O O X . |\n| X X O O O X X |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'))
+    diagonal = Bitboard.from_array(string_to_board('| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . X . . . |\n| . . X O . . . |\n| . X O O . . . |\n| X O O O . . . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'))
+    full = Bitboard.from_array(string_to_board('| - - - - - - - |\n| X O X O X O X |\n| X O X O X O X |\n| O X O X O X O |\n| O X O X O X O |\n| X O X O X O X |\n| X O X O X O X |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |'))
+    wrap = Bitboard()
+    for action in (0, 0, 0, 1):
+        wrap.apply(action, PLAYER1)  # three on top of column 0 and one at the bottom of column 1
+
+    assert row.is_win(PLAYER1) and not row.is_win(PLAYER2)
+    assert diagonal.is_win(PLAYER2) and not diagonal.is_win(PLAYER1)
+    assert not wrap.is_win(PLAYER1)
+    assert full.is_draw()
+    assert full.end_state(PLAYER1) == GameState.IS_DRAW
+    assert row.end_state(PLAYER1) == GameState.IS_WIN
+    assert not row.is_draw()
+
+
+def test_connected_four_at():
+    from agents.common import connected_four_at, place_piece, initialize_game_state, PLAYER1, PLAYER2
+
+    board = initialize_game_state()
+    for action, player in ((0, PLAYER1), (1, PLAYER2), (1, PLAYER1), (2, PLAYER2), (2, PLAYER2), (2, PLAYER1), (3, PLAYER2), (3, PLAYER2), (3, PLAYER2)):
+        place_piece(board, action, player)
+
+    row = place_piece(board, 3, PLAYER1)
+
+    assert row == 3
+    assert board[3, 3] == PLAYER1
+    assert connected_four_at(board, PLAYER1, row, 3) == True
+    assert connected_four_at(board, PLAYER2, row, 3) == False
+    assert connected_four_at(board, PLAYER2, 2, 3) == False
+    assert connected_four_at(board, PLAYER2, 0, 3) == False
+
+
+def test_board_state():
+    from agents.common import BoardState, IllegalMoveError, string_to_board, PLAYER1, PLAYER2
+
+    board = string_to_board('| - - - - - - - |\n| . . X O . . . |\n| . X O X . . . |\n| . X O O . . . |\n| . O X O O . . |\n| . X O X O . . |\n| . X X O O X . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |')
+    state = BoardState(board)
+
+    assert state.heights == [0, 5, 6, 6, 3, 1, 0]
+    assert state.legal_actions() == [0, 1, 4, 5, 6]
+    assert state.is_full() == False
+
+    row = state.apply(4, PLAYER2)
+
+    assert row == 3
+    assert board[3, 4] == PLAYER2
+    assert state.heights[4] == 4 and state.n_moves == 22
+
+    state.undo(4)
+
+    assert board[3, 4] == 0
+    assert state.heights[4] == 3 and state.n_moves == 21
+    with pytest.raises(IllegalMoveError):
+        state.apply(2, PLAYER1)
+    with pytest.raises(IllegalMoveError):
+        state.apply(7, PLAYER1)
+
+    full = BoardState(np.ones((6, 7), dtype=np.int8))
+
+    assert full.is_full() == True
+    assert full.legal_actions() == []
+
+
+def test_moved_cell():
+    from agents.common import moved_cell, initialize_game_state, apply_player_action, PLAYER1, PLAYER2
+
+    board = initialize_game_state()
+    after = apply_player_action(board, 2, PLAYER1, copy=True)
+    assert moved_cell(board, after) == (0, 2)
+    assert moved_cell(board, board) is None
+    assert moved_cell(after, board) is None  # a piece was removed
+    assert moved_cell(board, apply_player_action(after, 3, PLAYER2, copy=True)) is None
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from agents.common import PLAYER1, PLAYER2, Bitboard
+
+
+def _random_position(empty: int, seed: int):
+    '''a random game position with `empty` empty cells that is not over yet, and the player to move'''
+    rand = random.Random(seed)
+    while True:
+        bitboard, player = Bitboard(), PLAYER1
+        while bitboard.n_moves < 42 - empty:
+            bitboard.apply(rand.choice(bitboard.legal_actions()), player)
+            if bitboard.is_win(player):
+                break
+            player = 3 - player
+        else:
+            return bitboard, player
+
+
+def _brute_force(bitboard: Bitboard, player) -> int:
+    '''plain negamax over all moves, with the score convention of EndgameSolver'''
+    best = None
+    for action in bitboard.legal_actions():
+        bitboard.apply(action, player)
+        if bitboard.is_win(player):
+            score = (42 + 1 - (bitboard.n_moves - 1)) // 2
+        elif bitboard.n_moves == 42:
+            score = 0
+        else:
+            score = -_brute_force(bitboard, 3 - player)
+        bitboard.undo(action)
+        best = score if best is None else max(best, score)
+    return best
+
+
+def test_winning_cells():
+    from agents.endgame import _winning_cells
+
+    bitboard = Bitboard()
+    for col in (1, 2, 3):
+        bitboard.apply(col, PLAYER1)
+    mask = bitboard.masks[PLAYER1] | bitboard.masks[PLAYER2]
+
+    ret = _winning_cells(bitboard.masks[PLAYER1], mask)
+
+    assert ret == 1 << 0 | 1 << 4 * 7  # both ends of the bottom row
+    assert _winning_cells(bitboard.masks[PLAYER2], mask) == 0
+
+
+def test_score_matches_brute_force():
+    from agents.endgame import EndgameSolver
+
+    solver = EndgameSolver(table_size=2**12)
+    for seed in range(30):
+        bitboard, player = _random_position(4 + seed % 5, seed)
+
+        ret = solver.score(bitboard, player)
+
+        assert ret == _brute_force(bitboard, player)
+        assert solver.best_move(bitboard, player)[1] == ret
+
+
+def test_best_move():
+    from agents.common import initialize_game_state
+    from agents.endgame import EndgameSolver
+
+    solver = EndgameSolver(max_empty=6)
+    for seed in range(10):
+        bitboard, player = _random_position(6, seed)
+
+        action, score = solver.best_move(bitboard, player)
+
+        assert score == _brute_force(bitboard, player)
+        bitboard.apply(action, player)
+        assert bitboard.is_win(player) or bitboard.n_moves == 42 or -_brute_force(bitboard, 3 - player) == score
+        assert solver.applies(bitboard)
+
+    assert solver.applies(initialize_game_state()) is False
+    with pytest.raises(ValueError):
+        EndgameSolver(table_size=0)
+
+
+def test_agents_use_solver():
+    from agents.endgame import EndgameSolver
+    from agents.agent_minimax.minimax import generate_smart_move
+    from agents.agent_MCTS.MCTS import monte_carlo_tree_search
+
+    bitboard, player = _random_position(10, 7)
+    board = bitboard.to_array()
+    scores = {}
+    solver = EndgameSolver()
+    for action in bitboard.legal_actions():
+        bitboard.apply(action, player)
+        if bitboard.is_win(player):
+            scores[action] = 100
+        elif bitboard.n_moves < 42:
+            scores[action] = -solver.score(bitboard, 3 - player)
+        else:
+            scores[action] = 0
+        bitboard.undo(action)
+    best = max(scores.values())
+
+    action, saved_state = generate_smart_move(board, player, None, endgame_empty=10)
+    assert scores[action] == best
+    assert saved_state.depths == [10]
+    assert saved_state.endgame is not None
+
+    action, _ = monte_carlo_tree_search(board, player, None, endgame_empty=10)
+    assert scores[action] == best
@@ -0,0 +1,101 @@
+import numpy as np
+
+import pytest
+
+from agents.common import PLAYER1, PLAYER2, CONNECT_N
+
+
+def random_boards(n_boards: int, seed: int = 0) -> list:
+    from agents.common import initialize_game_state, apply_player_action, legal_actions, connected_four
+
+    rng = np.random.default_rng(seed)
+    boards = []
+    for _ in range(n_boards):
+        board = initialize_game_state()
+        player = PLAYER1
+        for _ in range(rng.integers(0, 42)):
+            actions = legal_actions(board)
+            if not actions:
+                break
+            apply_player_action(board, rng.choice(actions), player)
+            if connected_four(board, player):
+                break
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+        boards.append(board)
+    return boards
+
+
+def test_place_piece_jit():
+    from agents.common import _place_piece_jit, initialize_game_state, IllegalMoveError
+
+    board = initialize_game_state()
+    assert _place_piece_jit(board, 3, PLAYER1) == 0
+    assert _place_piece_jit(board, 3, PLAYER2) == 1
+    assert board[1, 3] == PLAYER2
+
+    board[:, 0] = PLAYER1
+    with pytest.raises(IllegalMoveError):
+        _place_piece_jit(board, 0, PLAYER2)
+    with pytest.raises(IllegalMoveError):
+        _place_piece_jit(board, 7, PLAYER2)
+
+
+def test_connected_four_jit():
+    from agents.common import _connected_four_jit, _connected_four_at_jit
+    from agents.windows import window_counts
+
+    for board in random_boards(50):
+        for player in (PLAYER1, PLAYER2):
+            expected = bool((window_counts(board, player) == CONNECT_N).any())
+            assert _connected_four_jit(board, player) == expected
+            at_any = any(_connected_four_at_jit(board, player, row, col) for row, col in zip(*np.nonzero(board)))
+            assert at_any == expected
+
+
+def test_legal_actions_jit():
+    from agents.common import _legal_actions_jit
+
+    for board in random_boards(20, seed=1):
+        assert _legal_actions_jit(board) == np.flatnonzero(board[-1] == 0).tolist()
+
+
+def test_connected_n_jit():
+    from agents.windows import _connected_n_jit, window_counts
+
+    for board in random_boards(50, seed=2):
+        for player in (PLAYER1, PLAYER2):
+            assert _connected_n_jit(board, player) == bool((window_counts(board, player) == CONNECT_N).any())
+
+
+def test_position_value_jit():
+    from agents.agent_minimax.minimax import _position_value_jit, position_values
+
+    boards = random_boards(20, seed=3)
+    for player in (PLAYER1, PLAYER2):
+        expected = position_values(np.array(boards), player)
+        assert [_position_value_jit(board, player) for board in boards] == expected.tolist()
+
+
+def test_rollout_kernel():
+    from agents.common import Bitboard, initialize_game_state, BOARD_ROWS, BITBOARD_HEIGHT
+    from agents.agent_MCTS.rollout import rollout_nogil, batch_rollouts, RUN_SHIFTS
+    from agents.jit import rollout_kernel
+
+    board = initialize_game_state()
+    board[:3, 0] = PLAYER1
+    board[0, 1:4] = PLAYER2
+    bitboard = Bitboard.from_array(board)
+    heights = np.array(bitboard.heights, dtype=np.int64)
+    # with all random numbers 0 the first column that is not full is played, PLAYER1 completes column 0
+    assert rollout_kernel(bitboard.masks[PLAYER1], bitboard.masks[PLAYER2], heights, PLAYER1, np.zeros(36),
+                          BOARD_ROWS, BITBOARD_HEIGHT, RUN_SHIFTS) == PLAYER1
+    assert heights[0] == 4
+
+    # the same distribution of results as batch_rollouts from the empty board
+    rng = np.random.default_rng(0)
+    empty = Bitboard.from_array(initialize_game_state())
+    winners = rollout_nogil(empty, PLAYER1, rng, 4000)
+    reference = batch_rollouts(empty, PLAYER1, 4000, rng)
+    for player in (PLAYER1, PLAYER2):
+        assert abs(np.mean(winners == player) - np.mean(reference == player)) < 0.05
+    assert rollout_nogil(empty, PLAYER1, rng)[0] in (0, PLAYER1, PLAYER2)
@@ -0,0 +1,74 @@
+import json
+import io
+import numpy as np
+
+import pytest
+
+from agents.common import PLAYER1, PLAYER2
+
+
+def test_search_stats():
+    from agents.metrics import SearchStats
+
+    stats = SearchStats('minimax', PLAYER1, np.int8(3), 0.5, nodes=1000, tt_hit_rate=0.25, depth=4)
+
+    assert stats.nodes_per_second == 2000
+    assert SearchStats('random', PLAYER1, 0, 0.0).nodes_per_second == 0
+    record = json.loads(json.dumps(stats.to_dict()))
+    assert record['action'] == 3 and record['depth'] == 4 and record['tt_hit_rate'] == 0.25
+
+
+def test_metrics_recorder(tmp_path):
+    from agents.metrics import MetricsRecorder, SearchStats
+
+    stream = io.StringIO()
+    recorder = MetricsRecorder(stream)
+    recorder(SearchStats('random', PLAYER1, 0, 0.1))
+    recorder(SearchStats('random', PLAYER2, 1, 0.2))
+    assert len(recorder.records) == 2
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line['player'] for line in lines] == [PLAYER1, PLAYER2]
+    assert all('time' in line for line in lines)
+
+    path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(str(path))
+    recorder(SearchStats('random', PLAYER1, 0, 0.1))
+    recorder.close()
+    assert json.loads(path.read_text())['agent'] == 'random'
+
+
+def test_agent_metrics():
+    from agents.metrics import MetricsRecorder
+    from agents.common import initialize_game_state, apply_player_action
+    from agents.agent_random import generate_move as generate_move_random
+    from agents.agent_minimax import generate_move as generate_move_minimax
+    from agents.agent_MCTS import generate_move as generate_move_mcts
+    from agents.agent_MCTS.budget import SearchBudget
+
+    board = initialize_game_state()
+    apply_player_action(board, 3, PLAYER1)
+    recorder = MetricsRecorder()
+
+    generate_move_random(board, PLAYER2, None, metrics=recorder)
+    assert recorder.records[-1].agent == 'random' and recorder.records[-1].wall_time >= 0
+
+    action, saved_state = generate_move_minimax(board, PLAYER2, None, depth=3, metrics=recorder)
+    stats = recorder.records[-1]
+    assert saved_state.stats is stats
+    assert stats.action == action and stats.depth == 3
+    assert stats.nodes == saved_state.nodes[-1] > 0
+    assert 0 <= stats.tt_hit_rate <= 1
+
+    action, saved_state = generate_move_mcts(board, PLAYER2, None, SearchBudget(iterations=200), metrics=recorder)
+    stats = recorder.records[-1]
+    assert saved_state.stats is stats
+    assert stats.nodes == 200 and stats.rollouts == 200
+    assert stats.tree_size == 201 #every iteration adds one node
+    assert stats.depth >= 2
+
+    action, saved_state = generate_move_mcts(board, PLAYER2, None, SearchBudget(iterations=200), node_cap=1000,
+                                             metrics=recorder)
+    stats = recorder.records[-1]
+    assert stats.nodes == 200 and stats.rollouts == 200
+    assert stats.tree_size > len(saved_state.pool) #the pool keeps the subtree of the chosen move only
+    assert stats.depth >= 2
@@ -92,3 +92,201 @@ def test_alphabeta():
     ret2 = alphabeta(board2, alpha, beta, False,PLAYER1, depth=5)
 
     assert (ret1 > ret2)  == True
+
+
+def test_alphabeta_restores_board():
+    from agents.agent_minimax.minimax import alphabeta
+    from agents.common import BoardState, string_to_board
+
+    board = string_to_board("| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . X O . . . |\n| . . O X O . . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |")
+    state = BoardState(board.copy())
+
+    ret1 = alphabeta(state, -999, 999, True, PLAYER1, depth=3)
+    ret2 = alphabeta(board, -999, 999, True, PLAYER1, depth=3)
+
+    assert ret1 == ret2
+    assert (state.board == board).all()
+    assert state.heights == [0, 0, 2, 2, 1, 0, 0]
+
+
+def test_transposition_table():
+    from agents.agent_minimax.transposition import TranspositionTable, Bound
+
+    tt = TranspositionTable(size=8)
+    tt.store(3, 2, 50, Bound.EXACT, 4)
+    tt.store(11, 1, 10, Bound.LOWER, 2)  # same slot, shallower: keeps the deeper entry
+
+    assert tt.probe(3) == (3, 2, 50, Bound.EXACT, 4, 0)
+    assert tt.probe(11) is None
+
+    tt.new_search()
+    tt.store(11, 1, 10, Bound.LOWER, 2)  # older entries are replaced
+
+    assert tt.probe(11)[2] == 10
+    assert tt.probe(3) is None
+    assert tt.probes == 4 and tt.hits == 2
+    assert tt.hit_rate == 0.5
+    assert tt.overwrites == 1
+    assert len(tt) == 1
+
+
+def test_zobrist_hash():
+    from agents.agent_minimax.transposition import zobrist_hash, ZOBRIST
+    from agents.common import initialize_game_state, apply_player_action
+
+    board1 = initialize_game_state()
+    board2 = initialize_game_state()
+    for action, player in ((3, PLAYER1), (4, PLAYER2), (2, PLAYER1)):
+        apply_player_action(board1, action, player)
+    for action, player in ((2, PLAYER1), (4, PLAYER2), (3, PLAYER1)):
+        apply_player_action(board2, action, player)
+
+    assert zobrist_hash(board1) == zobrist_hash(board2)  # transposition
+    assert zobrist_hash(initialize_game_state()) == 0
+    assert zobrist_hash(board1) ^ ZOBRIST[PLAYER1][0][2] == zobrist_hash(apply_player_action(initialize_game_state(), 3, PLAYER1)) ^ ZOBRIST[PLAYER2][0][4]
+
+
+def test_alphabeta_transposition_table():
+    from agents.agent_minimax.minimax import alphabeta, SearchContext
+    from agents.agent_minimax.transposition import TranspositionTable
+    from agents.common import string_to_board
+
+    board = string_to_board("| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . X O . . . |\n| . . O X O . . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |")
+    context = SearchContext(TranspositionTable())
+
+    ret1 = alphabeta(board, -999, 999, True, PLAYER1, depth=4)
+    ret2 = alphabeta(board, -999, 999, True, PLAYER1, depth=4, context=context)
+    hits = context.tt.hits
+    ret3 = alphabeta(board, -999, 999, True, PLAYER1, depth=4, context=context)
+
+    assert ret1 == ret2 == ret3
+    assert hits > 0
+    assert context.tt.hits == hits + 1  # the root itself is stored
+
+
+def test_generate_smart_move_iterative_deepening():
+    from agents.agent_minimax.minimax import generate_smart_move, MinimaxState
+    from agents.common import string_to_board
+
+    board = string_to_board("| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . X X . . . |\n| . O O O X . . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |")
+
+    action1, saved_state = generate_smart_move(board, PLAYER1, None, time_budget=0.0)
+    action2, saved_state = generate_smart_move(board, PLAYER1, saved_state, time_budget=1.0, max_depth=2)
+
+    assert isinstance(saved_state, MinimaxState)
+    assert action1 == 0  # even depth 1 finds the win
+    assert action2 == 0
+    assert saved_state.depths == [1, 2]
+
+
+def test_move_ordering():
+    from agents.agent_minimax.ordering import MoveOrdering, CENTER_ORDER
+
+    ordering = MoveOrdering()
+
+    assert CENTER_ORDER == [3, 2, 4, 1, 5, 0, 6]
+    assert ordering.order([0, 1, 2, 3, 6], 5, PLAYER1) == [3, 2, 1, 0, 6]
+
+    ordering.cutoff(6, 5, 2, PLAYER1)
+    ordering.cutoff(1, 7, 3, PLAYER1)
+
+    assert ordering.order([0, 1, 2, 3, 6], 5, PLAYER1) == [6, 1, 3, 2, 0]  # killer first, then by history
+    assert ordering.order([0, 1, 2, 3, 6], 5, PLAYER2) == [6, 3, 2, 1, 0]  # killers are shared, history is per player
+    assert MoveOrdering(center=False, killers=0, history=False).order([0, 1, 2, 3, 6], 5, PLAYER1) == [0, 1, 2, 3, 6]
+
+
+def test_alphabeta_move_ordering():
+    from agents.agent_minimax.minimax import alphabeta, SearchContext
+    from agents.agent_minimax.ordering import MoveOrdering
+    from agents.common import string_to_board
+
+    board = string_to_board("| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . X O . . . |\n| . . O X O . . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |")
+    plain = SearchContext(ordering=MoveOrdering(center=False, killers=0, history=False))
+    ordered = SearchContext(ordering=MoveOrdering())
+
+    ret1 = alphabeta(board, -999, 999, True, PLAYER1, depth=3, context=plain)
+    ret2 = alphabeta(board, -999, 999, True, PLAYER1, depth=3, context=ordered)
+
+    assert ret1 == ret2
+    assert 0 < ordered.nodes < plain.nodes
+
+
+def test_position_values():
+    from agents.agent_minimax.minimax import position_values, position_value, WINDOWS
+    from agents.common import initialize_game_state, apply_player_action
+
+    rng = np.random.default_rng(0)
+    boards = []
+    board = initialize_game_state()
+    for _ in range(30):
+        action = rng.choice(np.flatnonzero(board[-1] == NO_PLAYER))
+        apply_player_action(board, action, PLAYER1 if len(boards) % 2 == 0 else PLAYER2)
+        boards.append(board.copy())
+    boards = np.stack(boards)
+
+    ret1 = position_values(boards, PLAYER1)
+    ret2 = position_values(boards, PLAYER2)
+
+    assert WINDOWS.shape == (69, CONNECT_N)
+    assert ret1.shape == (30,)
+    assert list(ret1) == [position_value(b, PLAYER1) for b in boards]
+    assert list(ret2) == [position_value(b, PLAYER2) for b in boards]
+    for b, value in zip(boards, ret1):
+        expected = (b[:, 3] == PLAYER1).sum() * 10 - (b[:, 3] == PLAYER2).sum() * 5
+        for window in b.reshape(-1)[WINDOWS]:
+            own, other = (window == PLAYER1).sum(), (window == PLAYER2).sum()
+            if other == 0:
+                expected += {4: 200, 3: 50, 2: 10}.get(own, 0)
+            if own == 0:
+                expected += {4: -250, 3: -55, 2: -12}.get(other, 0)
+        assert value == expected
+
+
+def test_incremental_evaluator():
+    from agents.agent_minimax.minimax import IncrementalEvaluator, position_value, alphabeta, SearchContext
+    from agents.common import BoardState, string_to_board
+
+    board = string_to_board("| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . . . . . . |\n| . . X O . . . |\n| . . O X O . . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |")
+    state = BoardState(board.copy())
+    evaluator = IncrementalEvaluator(state.board, PLAYER2)
+    rng = np.random.default_rng(1)
+    moves = []
+    for ply in range(20):
+        action = rng.choice(state.legal_actions())
+        piece = PLAYER1 if ply % 2 == 0 else PLAYER2
+        row = state.apply(action, piece)
+        evaluator.place(row, action, piece)
+        moves.append((row, action, piece))
+        assert evaluator.value == position_value(state.board, PLAYER2)
+    for row, action, piece in reversed(moves):
+        state.undo(action)
+        evaluator.remove(row, action, piece)
+        assert evaluator.value == position_value(state.board, PLAYER2)
+
+    context = SearchContext(evaluator=IncrementalEvaluator(board, PLAYER1))
+
+    assert alphabeta(board, -999, 999, True, PLAYER1, depth=3, context=context) == alphabeta(board, -999, 999, True, PLAYER1, depth=3)
+
+
+def test_parallel_search_root():
+    import random
+    from agents.agent_minimax.minimax import generate_smart_move
+    from agents.common import initialize_game_state, apply_player_action
+
+    rand = random.Random(4)
+    saved_state = None
+    for n_moves in (0, 3, 6, 9):
+        board = initialize_game_state()
+        for move in range(n_moves):
+            apply_player_action(board, rand.choice([col for col in range(7) if board[-1, col] == 0]), PLAYER1 if move % 2 == 0 else PLAYER2)
+        player = PLAYER1 if n_moves % 2 == 0 else PLAYER2
+
+        action1, _ = generate_smart_move(board, player, None, depth=3)
+        action2, saved_state = generate_smart_move(board, player, saved_state, depth=3, workers=2)
+
+        assert action1 == action2
+
+    action, saved_state = generate_smart_move(board, player, saved_state, time_budget=0.3, workers=2)
+    assert saved_state.depths[-1] >= 1
+    saved_state.close()
+    assert saved_state.pool is None
@@ -0,0 +1,50 @@
+import numpy as np
+
+import pytest
+
+from agents.common import PLAYER1, PLAYER2, CONNECT_N
+
+
+def test_window_table():
+    from agents.windows import window_table, WINDOWS, CELL_WINDOWS
+
+    ret = window_table(5, 6)
+
+    assert WINDOWS.shape == (69, CONNECT_N)
+    assert ret.shape == (5 * 3 + 2 * 6 + 2 * 2 * 3, CONNECT_N)
+    assert [0, 1, 2, 3] in WINDOWS.tolist()  # bottom row
+    assert [3, 10, 17, 24] in WINDOWS.tolist()  # column 3
+    assert [0, 8, 16, 24] in WINDOWS.tolist()  # diagonal
+    assert [21, 15, 9, 3] in WINDOWS.tolist()  # anti diagonal
+    assert len(CELL_WINDOWS[0]) == 3
+    assert len(CELL_WINDOWS[3 * 7 + 3]) == 13  # the cells in the middle take part in the most lines
+
+
+def test_window_counts():
+    from agents.windows import window_counts, WINDOWS
+    from agents.common import initialize_game_state
+
+    board = initialize_game_state()
+    board[0, :4] = PLAYER1
+    board[1, 0] = PLAYER2
+
+    ret = window_counts(board, PLAYER1)
+
+    assert ret.shape == (69,)
+    assert ret[WINDOWS.tolist().index([0, 1, 2, 3])] == 4
+    assert ret.sum() == (WINDOWS < 4).sum()
+
+
+def test_connected_n():
+    from agents.windows import connected_n
+    from agents.common import string_to_board
+
+    board1 = string_to_board('| - - - - - - - |\n| . . X O . . . |\n| . X O X . . . |\n| . X O O . . . |\n| . O X O O . . |\n| . X O X O . . |\n| . X X O O X . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |')
+    board2 = string_to_board("| - - - - - - - |\n| . . . . . . . |\n| . . . . . . . |\n| . . . X . . . |\n| . . X O . . . |\n| . X O O . . . |\n| X O O O . . . |\n| - - - - - - - |\n| 0 1 2 3 4 5 6 |")
+    board3 = np.array([[0, 0, 2, 1, 1, 1], [0, 0, 0, 2, 2, 1], [0, 0, 0, 0, 2, 1], [0, 0, 0, 0, 0, 2], [0, 0, 0, 0, 0, 0]])
+
+    assert connected_n(board1, PLAYER1) == False
+    assert connected_n(board1, PLAYER2) == False
+    assert connected_n(board2, PLAYER2) == True
+    assert connected_n(board2, PLAYER1) == False
+    assert connected_n(board3, PLAYER2) == True